@@ -0,0 +1,347 @@
+from urllib.parse import quote
+
+from Keycloak.KeycloakClientApi import update_service_account_profile
+from Keycloak.RealmMetadataCache import RealmMetadataCache
+from Utils.async_transport import AsyncBackendSession, AsyncHttpTransport
+
+"""
+Manages all clients on Keycloak using asyncio
+
+Offers the operations of KeycloakClientApi as coroutines, so that a single event
+loop can keep many Keycloak requests in flight.
+
+"""
+
+
+class AsyncKeycloakClientApi:
+
+    """
+    Class constructor
+
+    Parameters:
+        auth_url (str): The URI of the Authorization Server
+        realm (str): The name of the realm
+        token  (str): An access token with admin privileges
+        realm_cache_ttl (float): The number of seconds realm client scopes are cached, `0` disables the cache
+        max_connections (int): The maximum number of connections kept open to Keycloak
+        connect_timeout (float): The connect timeout of a request in seconds
+        read_timeout (float): The read timeout of a request in seconds
+        session (AsyncBackendSession): The session to reuse, e.g. with the limiter and the circuit breaker of
+        the backend, else a new one with `max_connections` is created
+        token_manager (TokenManager): Renews the access token when it expires or is rejected, else `None`
+
+    """
+
+    def __init__(
+        self,
+        auth_url,
+        realm,
+        token,
+        realm_cache_ttl=300,
+        max_connections=100,
+        connect_timeout=5,
+        read_timeout=60,
+        session=None,
+        token_manager=None,
+    ):
+        self.auth_url = auth_url
+        self.realm = realm
+        if session is None:
+            session = AsyncBackendSession(max_connections)
+        self.transport = AsyncHttpTransport(session, connect_timeout, read_timeout, token_manager=token_manager)
+        self.session = self.transport.session
+        self.token = token
+        self.realm_cache = RealmMetadataCache(realm_cache_ttl)
+
+    """
+    Replace the access token used by the client
+
+    Parameters:
+        token  (str): An access token with admin privileges
+    """
+
+    def set_token(self, token):
+        self.token = token
+
+    """
+    Close the connections of the client
+    """
+
+    async def close(self):
+        await self.transport.close()
+
+    """
+    Get a registered client by ID
+
+    Parameters:
+        client_id (str): The client_id of the client
+
+    Returns:
+        response (JSON Object): A registered client in JSON format
+    """
+
+    async def get_client_by_id(self, client_id):
+        url = (
+            self.auth_url + "/realms/" + self.realm + "/clients-registrations/default/" + quote(str(client_id), safe="")
+        )
+        return await self.http_request("GET", url)
+
+    """
+    Register new client
+
+    Parameters:
+        client_object (str): A string with the client data in JSON format
+
+    Returns:
+        response (JSON Object): The registered client in JSON format
+    """
+
+    async def create_client(self, client_object):
+        url = self.auth_url + "/realms/" + self.realm + "/clients-registrations/default"
+        return await self.http_request("POST", url, data=client_object)
+
+    """
+    Update an existing client by ID
+
+    Parameters:
+        client_id (str): The client_id of the client
+        client_object (str): A string with the client data in JSON format
+
+    Returns:
+        response (JSON Object): The registered client in JSON format
+    """
+
+    async def update_client(self, client_id, client_object):
+        url = (
+            self.auth_url + "/realms/" + self.realm + "/clients-registrations/default/" + quote(str(client_id), safe="")
+        )
+        return await self.http_request("PUT", url, data=client_object)
+
+    """
+    Delete a registered client by ID
+
+    Parameters:
+        client_id (str): The client_id of the client
+
+    Returns:
+        response (JSON Object): The status of the HTTP Response
+    """
+
+    async def delete_client(self, client_id):
+        url = (
+            self.auth_url + "/realms/" + self.realm + "/clients-registrations/default/" + quote(str(client_id), safe="")
+        )
+        return await self.http_request("DELETE", url)
+
+    """
+    Get OIDC client's "Permissions"
+
+    Parameters:
+        keycloak_id (str): The keycloak_id of the client
+
+    Returns:
+        response (JSON Object): The response from the Client AuthZ Permissions API
+    """
+
+    async def get_client_authz_permissions(self, keycloak_id):
+        url = self.auth_url + "/admin/realms/" + self.realm + "/clients/" + str(keycloak_id) + "/management/permissions"
+        return await self.http_request("GET", url)
+
+    """
+    Enable OIDC client's "Permissions"
+
+    Parameters:
+        keycloak_id (str): The keycloak_id of the client
+        action (str): "enable" or "disable" Client Authorization Permissions
+
+    Returns:
+        response (JSON Object): The response from the Client AuthZ Permissions API
+    """
+
+    async def update_client_authz_permissions(self, keycloak_id, action):
+        url = self.auth_url + "/admin/realms/" + self.realm + "/clients/" + str(keycloak_id) + "/management/permissions"
+        client_object = {"enabled": action == "enable"}
+        return await self.http_request("PUT", url, data=client_object)
+
+    """
+    Create Custom Mapper
+
+    Parameters:
+        keycloak_id (str): The keycloak_id of the client
+        mapper (JSON Object): A JSON Object with the mapper
+
+    Returns:
+        response (JSON Object): The status of the HTTP Response
+    """
+
+    async def add_mapper(self, keycloak_id, mapper):
+        url = (
+            self.auth_url + "/admin/realms/" + self.realm + "/clients/" + str(keycloak_id) + "/protocol-mappers/models"
+        )
+        return await self.http_request("POST", url, data=mapper)
+
+    """
+    Get realm default client scopes
+
+    Returns:
+        response (list): The realm default client scopes of the protocol
+    """
+
+    async def get_realm_default_client_scopes(self, protocol):
+        cached_client_scopes = self.realm_cache.get_default_client_scopes(protocol)
+        if cached_client_scopes is not None:
+            return cached_client_scopes
+
+        url = self.auth_url + "/admin/realms/" + self.realm + "/default-default-client-scopes"
+        response = await self.http_request("GET", url)
+
+        default_client_scopes = []
+        for client_scope in response["response"]:
+            if client_scope["protocol"] == protocol:
+                default_client_scopes.append(client_scope)
+
+        if response["status"] == 200:
+            self.realm_cache.set_default_client_scopes(response["response"])
+        return default_client_scopes
+
+    """
+    Sync realm client scopes
+
+    Returns:
+        response (dict): The realm client scope ids by name
+    """
+
+    async def sync_realm_client_scopes(self):
+        cached_scope_list = self.realm_cache.get_client_scopes()
+        if cached_scope_list is not None:
+            return cached_scope_list
+
+        url = self.auth_url + "/admin/realms/" + self.realm + "/client-scopes"
+        response = await self.http_request("GET", url)
+
+        scope_list = {}
+        for scope in response["response"]:
+            scope_list[scope["name"]] = scope["id"]
+
+        if response["status"] == 200:
+            self.realm_cache.set_client_scopes(scope_list)
+        return scope_list
+
+    """
+    Drop the cached realm default client scopes and realm client scopes
+    """
+
+    def invalidate_realm_cache(self):
+        self.realm_cache.invalidate()
+
+    """
+    Create realm OIDC client scope
+
+    Returns:
+        response (JSON Object): The status of the HTTP Response
+    """
+
+    async def create_realm_oidc_client_scopes(self, scope_name):
+        url = self.auth_url + "/admin/realms/" + self.realm + "/client-scopes"
+        client_scope_object = {
+            "name": scope_name,
+            "protocol": "openid-connect",
+            "attributes": {
+                "include.in.token.scope": "true",
+                "hide.from.openID.provider.metadata": "true",
+                "display.on.consent.screen": "true",
+            },
+        }
+
+        response = await self.http_request("POST", url, data=client_scope_object)
+        if response["status"] == 201 and "location" in response:
+            # Keycloak returns the id of the new client scope in the Location header
+            self.realm_cache.add_client_scope(scope_name, response["location"].rsplit("/", 1)[-1])
+        elif response["status"] in (201, 409):
+            # The cached client scopes are incomplete or stale
+            self.realm_cache.invalidate()
+        return response
+
+    """
+    Add client scope to the default or optional client scopes list of the client
+
+    Returns:
+        response (JSON Object): The status of the HTTP Response
+    """
+
+    async def add_client_scope_by_id(self, keycloak_id, client_scope_id, protocol):
+        url = self.client_scope_url(keycloak_id, client_scope_id, protocol)
+        return await self.http_request("PUT", url)
+
+    """
+    Remove client scope from the default or optional client scopes list of the client
+
+    Returns:
+        response (JSON Object): The status of the HTTP Response
+    """
+
+    async def remove_client_scope_by_id(self, keycloak_id, client_scope_id, protocol="openid-connect"):
+        url = self.client_scope_url(keycloak_id, client_scope_id, protocol)
+        return await self.http_request("DELETE", url)
+
+    def client_scope_url(self, keycloak_id, client_scope_id, protocol):
+        if protocol == "saml":
+            client_scopes_path = "/default-client-scopes/"
+        else:
+            client_scopes_path = "/optional-client-scopes/"
+        return (
+            self.auth_url
+            + "/admin/realms/"
+            + self.realm
+            + "/clients/"
+            + keycloak_id
+            + client_scopes_path
+            + client_scope_id
+        )
+
+    """
+    Get the user of the service account
+
+    Returns:
+        response (JSON Object): A user representation in JSON format
+    """
+
+    async def get_service_account_user(self, keycloak_id):
+        url = self.auth_url + "/admin/realms/" + self.realm + "/clients/" + keycloak_id + "/service-account-user"
+        return await self.http_request("GET", url)
+
+    """
+    Update user profile information
+
+    Returns:
+        response (JSON Object): The status of the HTTP Response, else `None` if the profile is unchanged
+    """
+
+    async def update_user(self, service_account_profile, keycloak_response, keycloak_config):
+        url = self.auth_url + "/admin/realms/" + self.realm + "/users/" + service_account_profile["id"]
+        update_flag = update_service_account_profile(service_account_profile, keycloak_response, keycloak_config)
+
+        if update_flag:
+            return await self.http_request("PUT", url, data=service_account_profile)
+
+    """
+    Send a request through the transport of the client
+
+    Parameters:
+        method (str): The request method
+        url (str): The URL of the Client Registration API
+        header (str): Additional Headers of the HTTP Request, else `None`
+        data (str): The data of the HTTP Request, else `None`
+
+    Returns:
+        response (JSON Object): The status of the HTTP Response, with the `location` of created resources
+
+    Raises:
+        DeadlineExceeded: If the time budget of the deployment is exhausted
+    """
+
+    async def http_request(self, method, url, header=None, data=None):
+        headers = {"Authorization": "Bearer " + self.token}
+        if header is not None:
+            headers.update(header)
+        return await self.transport.request(method, url, headers=headers, json=data)
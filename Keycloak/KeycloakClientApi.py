@@ -1,6 +1,7 @@
 from urllib.parse import quote
 
-import requests
+from Keycloak.RealmMetadataCache import RealmMetadataCache
+from Utils.transport import HttpTransport
 
 """
 Manages all clients on Keycloak
@@ -17,13 +18,44 @@ class KeycloakClientApi:
         auth_url (str): The URI of the Authorization Server
         realm (str): The name of the realm
         token  (str): An access token with admin privileges
+        session (requests.Session): A pooled session to reuse, a new one is created if omitted
+        realm_cache_ttl (float): The number of seconds realm client scopes are cached, `0` disables the cache
+        connect_timeout (float): The connect timeout of a request in seconds
+        read_timeout (float): The read timeout of a request in seconds
+        token_manager (TokenManager): Renews the access token when it expires or is rejected, else `None`
+
+    Requests made within a deadline (see Utils.deadline) never wait longer than what is left of it.
+
+    """
+
+    def __init__(
+        self,
+        auth_url,
+        realm,
+        token,
+        session=None,
+        realm_cache_ttl=300,
+        connect_timeout=5,
+        read_timeout=60,
+        token_manager=None,
+    ):
+        self.auth_url = auth_url
+        self.realm = realm
+        self.transport = HttpTransport(session, connect_timeout, read_timeout, token_manager=token_manager)
+        self.session = self.transport.session
+        self.realm_cache = RealmMetadataCache(realm_cache_ttl)
+        self.set_token(token)
 
     """
+    Replace the access token used by the pooled session
 
-    def __init__(self, auth_url, realm, token):
-        self.auth_url = auth_url
-        self.realm = realm
+    Parameters:
+        token  (str): An access token with admin privileges
+    """
+
+    def set_token(self, token):
         self.token = token
+        self.session.headers["Authorization"] = "Bearer " + token
 
     """
     Get a registered client by ID
@@ -39,9 +71,7 @@ class KeycloakClientApi:
         url = (
             self.auth_url + "/realms/" + self.realm + "/clients-registrations/default/" + quote(str(client_id), safe="")
         )
-        header = {"Authorization": "Bearer " + self.token}
-
-        return self.http_request("GET", url, header)
+        return self.http_request("GET", url)
 
     """
     Register new client
@@ -55,12 +85,7 @@ class KeycloakClientApi:
 
     def create_client(self, client_object):
         url = self.auth_url + "/realms/" + self.realm + "/clients-registrations/default"
-        header = {
-            "Authorization": "Bearer " + self.token,
-            "Content-Type": "application/json",
-        }
-
-        return self.http_request("POST", url, header, client_object)
+        return self.http_request("POST", url, data=client_object)
 
     """
     Update an existing client by ID
@@ -77,12 +102,7 @@ class KeycloakClientApi:
         url = (
             self.auth_url + "/realms/" + self.realm + "/clients-registrations/default/" + quote(str(client_id), safe="")
         )
-        header = {
-            "Authorization": "Bearer " + self.token,
-            "Content-Type": "application/json",
-        }
-
-        return self.http_request("PUT", url, header, client_object)
+        return self.http_request("PUT", url, data=client_object)
 
     """
     Delete a registered client by ID
@@ -98,9 +118,45 @@ class KeycloakClientApi:
         url = (
             self.auth_url + "/realms/" + self.realm + "/clients-registrations/default/" + quote(str(client_id), safe="")
         )
-        header = {"Authorization": "Bearer " + self.token}
+        return self.http_request("DELETE", url)
 
-        return self.http_request("DELETE", url, header)
+    """
+    Iterate over the clients of the realm, fetching them one page at a time
+
+    Parameters:
+        page_size (int): The number of clients fetched with every request
+
+    Returns:
+        clients (generator): The client representations of the realm
+    """
+
+    def iter_clients(self, page_size=100):
+        url = self.auth_url + "/admin/realms/" + self.realm + "/clients"
+        first = 0
+        while True:
+            response = self.http_request("GET", url + "?first=" + str(first) + "&max=" + str(page_size))
+            if response["status"] != 200:
+                raise RuntimeError("Failed to get the clients of the realm: " + str(response.get("error")))
+            yield from response["response"]
+            if len(response["response"]) < page_size:
+                return
+            first += page_size
+
+    """
+    Create many clients at once using the partial import of the realm
+
+    Parameters:
+        client_objects (list): The client representations
+        if_resource_exists (str): What to do with clients that already exist, "FAIL", "SKIP" or "OVERWRITE"
+
+    Returns:
+        response (JSON Object): The partial import results, with the id of every imported client
+    """
+
+    def partial_import_clients(self, client_objects, if_resource_exists="FAIL"):
+        url = self.auth_url + "/admin/realms/" + self.realm + "/partialImport"
+        import_object = {"ifResourceExists": if_resource_exists, "clients": client_objects}
+        return self.http_request("POST", url, data=import_object)
 
     """
     Get OIDC client's "Permissions"
@@ -114,9 +170,7 @@ class KeycloakClientApi:
 
     def get_client_authz_permissions(self, keycloak_id):
         url = self.auth_url + "/admin/realms/" + self.realm + "/clients/" + str(keycloak_id) + "/management/permissions"
-        header = {"Authorization": "Bearer " + self.token}
-
-        return self.http_request("GET", url, header)
+        return self.http_request("GET", url)
 
     """
     Enable OIDC client's "Permissions"
@@ -131,14 +185,13 @@ class KeycloakClientApi:
 
     def update_client_authz_permissions(self, keycloak_id, action):
         url = self.auth_url + "/admin/realms/" + self.realm + "/clients/" + str(keycloak_id) + "/management/permissions"
-        header = {"Authorization": "Bearer " + self.token}
         if action == "enable":
             enabled = True
         else:
             enabled = False
         client_object = {"enabled": enabled}
 
-        return self.http_request("PUT", url, header, client_object)
+        return self.http_request("PUT", url, data=client_object)
 
     """
     Create Custom Mapper
@@ -153,8 +206,7 @@ class KeycloakClientApi:
 
     def add_mapper(self,keycloak_id,mapper):
         url = self.auth_url + "/admin/realms/" + self.realm + "/clients/" + str(keycloak_id) + "/protocol-mappers/models"
-        header = {"Authorization": "Bearer " + self.token}
-        return self.http_request("POST", url, header, mapper)
+        return self.http_request("POST", url, data=mapper)
         
 
     """
@@ -165,16 +217,20 @@ class KeycloakClientApi:
     """
 
     def get_realm_default_client_scopes(self, protocol):
-        url = self.auth_url + "/admin/realms/" + self.realm + "/default-default-client-scopes"
-        header = {"Authorization": "Bearer " + self.token}
+        cached_client_scopes = self.realm_cache.get_default_client_scopes(protocol)
+        if cached_client_scopes is not None:
+            return cached_client_scopes
 
-        response = self.http_request("GET", url, header)
+        url = self.auth_url + "/admin/realms/" + self.realm + "/default-default-client-scopes"
+        response = self.http_request("GET", url)
 
         default_client_scopes = []
         for client_scope in response["response"]:
             if client_scope["protocol"] == protocol:
                 default_client_scopes.append(client_scope)
 
+        if response["status"] == 200:
+            self.realm_cache.set_default_client_scopes(response["response"])
         return default_client_scopes
 
     """
@@ -185,23 +241,37 @@ class KeycloakClientApi:
     """
 
     def sync_realm_client_scopes(self):
+        cached_scope_list = self.realm_cache.get_client_scopes()
+        if cached_scope_list is not None:
+            return cached_scope_list
+
         url = self.auth_url + "/admin/realms/" + self.realm + "/client-scopes"
-        header = {"Authorization": "Bearer " + self.token}
-        response = self.http_request("GET", url, header)
+        response = self.http_request("GET", url)
 
         scope_list = {}
         for scope in response["response"]:
             scope_list[scope["name"]] = scope["id"]
 
+        if response["status"] == 200:
+            self.realm_cache.set_client_scopes(scope_list)
         return scope_list
 
+    """
+    Drop the cached realm default client scopes and realm client scopes
+    """
+
+    def invalidate_realm_cache(self):
+        self.realm_cache.invalidate()
+
     """
     Create realm OIDC client scope
+
+    Returns:
+        response (JSON Object): The status of the HTTP Response
     """
 
     def create_realm_oidc_client_scopes(self, scope_name):
         url = self.auth_url + "/admin/realms/" + self.realm + "/client-scopes"
-        header = {"Authorization": "Bearer " + self.token}
         client_scope_object = {
             "name": scope_name,
             "protocol": "openid-connect",
@@ -212,10 +282,20 @@ class KeycloakClientApi:
             },
         }
 
-        self.http_request("POST", url, header, client_scope_object)
+        response = self.http_request("POST", url, data=client_scope_object)
+        if response["status"] == 201 and "location" in response:
+            # Keycloak returns the id of the new client scope in the Location header
+            self.realm_cache.add_client_scope(scope_name, response["location"].rsplit("/", 1)[-1])
+        elif response["status"] in (201, 409):
+            # The cached client scopes are incomplete or stale
+            self.realm_cache.invalidate()
+        return response
 
     """
     Add client scope to the default or optional client scopes list of the client
+
+    Returns:
+        response (JSON Object): The status of the HTTP Response
     """
 
     def add_client_scope_by_id(self, keycloak_id, client_scope_id, protocol):
@@ -232,11 +312,13 @@ class KeycloakClientApi:
             + client_scopes_path
             + client_scope_id
         )
-        header = {"Authorization": "Bearer " + self.token}
-        self.http_request("PUT", url, header)
+        return self.http_request("PUT", url)
 
     """
     Remove client scope from the default or optional client scopes list of the client
+
+    Returns:
+        response (JSON Object): The status of the HTTP Response
     """
 
     def remove_client_scope_by_id(self, keycloak_id, client_scope_id, protocol="openid-connect"):
@@ -253,8 +335,7 @@ class KeycloakClientApi:
             + client_scopes_path
             + client_scope_id
         )
-        header = {"Authorization": "Bearer " + self.token}
-        self.http_request("DELETE", url, header)
+        return self.http_request("DELETE", url)
 
     """
     Get the user of the service account
@@ -265,94 +346,74 @@ class KeycloakClientApi:
 
     def get_service_account_user(self, keycloak_id):
         url = self.auth_url + "/admin/realms/" + self.realm + "/clients/" + keycloak_id + "/service-account-user"
-        header = {"Authorization": "Bearer " + self.token}
-        return self.http_request("GET", url, header)
+        return self.http_request("GET", url)
 
     """
     Update user profile information
+
+    Returns:
+        response (JSON Object): The status of the HTTP Response, else `None` if the profile is unchanged
     """
 
     def update_user(self, service_account_profile, keycloak_response, keycloak_config):
         url = self.auth_url + "/admin/realms/" + self.realm + "/users/" + service_account_profile["id"]
-        header = {"Authorization": "Bearer " + self.token}
-
-        update_flag = False
-        email_list = keycloak_response["attributes"]["contacts"].split(",")
-        first_name = keycloak_response["name"]
-        candidate_attr = keycloak_config["attribute_name"]
-        candidate_id = [service_account_profile[keycloak_config["candidate"]] + "@" + keycloak_config["scope"]]
-
-        if "email" not in service_account_profile or service_account_profile["email"] != email_list[0]:
-            service_account_profile["email"] = email_list[0]
-            update_flag = True
-        if "firstName" not in service_account_profile or service_account_profile["firstName"] != first_name:
-            service_account_profile["firstName"] = first_name
-            update_flag = True
-        if "attributes" not in service_account_profile:
-            service_account_profile["attributes"] = {}
-        if (
-            candidate_attr not in service_account_profile["attributes"]
-            or service_account_profile["attributes"][candidate_attr] != candidate_id
-        ):
-            service_account_profile["attributes"][candidate_attr] = candidate_id
-            update_flag = True
+        update_flag = update_service_account_profile(service_account_profile, keycloak_response, keycloak_config)
 
         if update_flag:
-            self.http_request("PUT", url, header, service_account_profile)
+            return self.http_request("PUT", url, data=service_account_profile)
 
     """
-    Wrapper function for Python requests
+    Send a request through the transport of the client
 
     Parameters:
         method (str): The request method
         url (str): The URL of the Client Registration API
-        header (str): The Headers of the HTTP Request
+        header (str): Additional Headers of the HTTP Request, else `None`
         data (str): The data of the HTTP Request, else `None`
     
     Returns:
-        response (JSON Object): The status of the HTTP Response
+        response (JSON Object): The status of the HTTP Response, with the `location` of created resources
+
+    Raises:
+        DeadlineExceeded: If the time budget of the deployment is exhausted
     """
 
-    def http_request(self, method, url, header, data=None):
-        try:
-            response = requests.request(method, url, headers=header, json=data)
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as errh:
-            print("HTTP Error: %s with error: HTTP %s and response: %s" % (url, response.status_code, response.json()))
-            return {
-                "status": response.status_code,
-                "error": repr(errh),
-                "response": response.json(),
-            }
-        except requests.exceptions.ConnectionError as errc:
-            print(
-                "Connection Error: %s with error: HTTP  %s and response: %s"
-                % (url, response.status_code, response.text)
-            )
-            return {
-                "status": response.status_code,
-                "error": repr(errc),
-                "response": response.json(),
-            }
-        except requests.exceptions.Timeout as errt:
-            print("Timeout Error: %s with error: HTTP %s and response: %s" % (url, response.status_code, response.text))
-            return {
-                "status": response.status_code,
-                "error": repr(errt),
-                "response": response.json(),
-            }
-        except requests.exceptions.RequestException as err:
-            print(
-                "Failed to make request to %s with error: HTTP  %s and response: %s"
-                % (url, response.status_code, response.text)
-            )
-            return {
-                "status": response.status_code,
-                "error": repr(err),
-                "response": response.json(),
-            }
-
-        if method == "DELETE" or response.status_code == 204 or not response.text:
-            return {"status": response.status_code, "response": "OK"}
-        else:
-            return {"status": response.status_code, "response": response.json()}
+    def http_request(self, method, url, header=None, data=None):
+        return self.transport.request(method, url, headers=header, json=data)
+
+
+"""
+Update the profile of a service account user to match the client
+
+Parameters:
+    service_account_profile (JSON Object): The user representation of the service account, updated in place
+    keycloak_response (JSON Object): The client representation
+    keycloak_config (dict): The service account config options
+
+Returns:
+    update_flag (bool): True if the profile was changed
+"""
+
+
+def update_service_account_profile(service_account_profile, keycloak_response, keycloak_config):
+    update_flag = False
+    email_list = keycloak_response["attributes"]["contacts"].split(",")
+    first_name = keycloak_response["name"]
+    candidate_attr = keycloak_config["attribute_name"]
+    candidate_id = [service_account_profile[keycloak_config["candidate"]] + "@" + keycloak_config["scope"]]
+
+    if "email" not in service_account_profile or service_account_profile["email"] != email_list[0]:
+        service_account_profile["email"] = email_list[0]
+        update_flag = True
+    if "firstName" not in service_account_profile or service_account_profile["firstName"] != first_name:
+        service_account_profile["firstName"] = first_name
+        update_flag = True
+    if "attributes" not in service_account_profile:
+        service_account_profile["attributes"] = {}
+    if (
+        candidate_attr not in service_account_profile["attributes"]
+        or service_account_profile["attributes"][candidate_attr] != candidate_id
+    ):
+        service_account_profile["attributes"][candidate_attr] = candidate_id
+        update_flag = True
+    return update_flag
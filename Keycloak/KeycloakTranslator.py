@@ -0,0 +1,282 @@
+import json
+
+"""
+Translates registry messages to Keycloak client representations
+
+The translation is driven by field-mapping tables that are compiled once at import
+into a map of handlers per registry field. The client templates are parsed once
+and copied for every message.
+
+"""
+
+OIDC_TEMPLATE = json.loads(
+    '{"attributes":{"client_credentials.use_refresh_token":"false","oauth2.device.authorization.grant.enabled":"false","oauth2.token.exchange.grant.enabled":false,"oidc.ciba.grant.enabled":"false","refresh.token.max.reuse":"0","revoke.refresh.token":"false","use.jwks.string":"false","use.jwks.url":"false","use.refresh.tokens":"false"},"directAccessGrantsEnabled":false,"implicitFlowEnabled":false,"publicClient":false,"serviceAccountsEnabled":false,"standardFlowEnabled":false,"webOrigins":["+"]}'
+)
+SAML_TEMPLATE = json.loads(
+    '{"attributes":{"saml.auto.updated":"true","saml.refresh.period":"3600","saml.skip.requested.attributes": "true"}}'
+)
+
+TOKEN_ENDPOINT_AUTH_METHODS = {
+    "client_secret_post": "client-secret",
+    "client_secret_basic": "client-secret",
+    "client_secret_jwt": "client-secret-jwt",
+    "private_key_jwt": "client-jwt",
+    "none": "client-secret",
+}
+
+GRANT_TYPES = {
+    "authorization_code": (None, "standardFlowEnabled"),
+    "client_credentials": (None, "serviceAccountsEnabled"),
+    "urn:ietf:params:oauth:grant-type:token-exchange": ("attributes", "oauth2.token.exchange.grant.enabled"),
+    "urn:ietf:params:oauth:grant-type:device_code": ("attributes", "oauth2.device.authorization.grant.enabled"),
+    "implicit": (None, "implicitFlowEnabled"),
+}
+
+"""
+Copy a parsed template
+
+The templates hold only dicts, lists and scalars, so a plain recursive copy is
+enough and much cheaper than `copy.deepcopy`.
+
+Parameters:
+    value (object): The template or a part of it
+
+Returns:
+    value (object): The copy
+"""
+
+
+def copy_template(value):
+    if isinstance(value, dict):
+        return {key: copy_template(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [copy_template(item) for item in value]
+    return value
+
+
+def map_token_endpoint_value(key):
+    return TOKEN_ENDPOINT_AUTH_METHODS.get(key)
+
+
+def add_saml_scopes_and_mappers(requested_attributes):
+    scopes = []
+    mappers = []
+    for attribute in requested_attributes:
+        scopes.append(attribute["friendly_name"])
+        if attribute["type"] == "custom":
+            mapper_object = {
+                "name": attribute["friendly_name"],
+                "protocol": "saml",
+                "protocolMapper": "saml-user-attribute-mapper",
+                "config": {
+                    "attribute.nameformat": "URI Reference",
+                    "user.attribute": attribute["friendly_name"],
+                    "friendly.name": attribute["friendly_name"],
+                    "attribute.name": attribute["name"],
+                },
+            }
+            mappers.append(mapper_object)
+    return scopes, mappers
+
+
+"""
+Build a handler that copies a registry field to a client field
+
+Parameters:
+    key (str): The client field, else the attribute name if `attribute` is set
+    convert (function): Converts the registry value, else `None` to copy it as is
+    attribute (bool): Whether the field is a client attribute
+
+Returns:
+    handler (function): Sets the client field from the registry value
+"""
+
+
+def set_field(key, convert=None, attribute=False):
+    def handler(new_msg, value, msg, realm_default_client_scopes):
+        if convert is not None:
+            value = convert(value)
+        if attribute:
+            new_msg["attributes"][key] = value
+        else:
+            new_msg[key] = value
+
+    return handler
+
+
+def set_client_id(new_msg, value, msg, realm_default_client_scopes):
+    if value:
+        new_msg["clientId"] = value
+
+
+def set_optional_client_scopes(new_msg, value, msg, realm_default_client_scopes):
+    new_msg["optionalClientScopes"] = list(value)
+    if "openid" in new_msg["optionalClientScopes"]:
+        new_msg["optionalClientScopes"].remove("openid")
+
+
+def set_grant_types(new_msg, value, msg, realm_default_client_scopes):
+    for grant_type in value:
+        if grant_type in GRANT_TYPES:
+            group, key = GRANT_TYPES[grant_type]
+            if group is None:
+                new_msg[key] = True
+            else:
+                new_msg[group][key] = True
+
+
+def set_token_endpoint_auth_method(new_msg, value, msg, realm_default_client_scopes):
+    if value == "none":
+        new_msg["publicClient"] = True
+    new_msg["clientAuthenticatorType"] = map_token_endpoint_value(value)
+
+
+def set_jwks(new_msg, value, msg, realm_default_client_scopes):
+    new_msg["attributes"]["use.jwks.string"] = "true"
+    new_msg["attributes"]["jwks.string"] = json.dumps(value)
+
+
+def set_jwks_uri(new_msg, value, msg, realm_default_client_scopes):
+    new_msg["attributes"]["use.jwks.url"] = True
+    new_msg["attributes"]["jwks.url"] = value
+
+
+def set_refresh_token_validity(new_msg, value, msg, realm_default_client_scopes):
+    new_msg["attributes"]["client.offline.session.max.lifespan"] = str(value)
+    if "reuse_refresh_token" in msg:
+        new_msg["attributes"]["revoke.refresh.token"] = str(not msg["reuse_refresh_token"]).lower()
+
+
+def set_access_token_validity(new_msg, value, msg, realm_default_client_scopes):
+    if value < 60:
+        new_msg["attributes"]["access.token.lifespan"] = "60"
+    else:
+        new_msg["attributes"]["access.token.lifespan"] = str(value)
+
+
+def set_requested_attributes(new_msg, value, msg, realm_default_client_scopes):
+    client_default_client_scopes, new_msg["protocolMappers"] = add_saml_scopes_and_mappers(value)
+    new_msg["defaultClientScopes"] = list(sorted(set(client_default_client_scopes + realm_default_client_scopes)))
+
+
+def set_contacts(new_msg, value, msg, realm_default_client_scopes):
+    emails = []
+    for contact in value:
+        if contact["type"] == "technical" or contact["type"] == "support":
+            emails.append(contact["email"])
+    # Remove duplicate entries, keeping the order of the contacts
+    emails = list(dict.fromkeys(emails))
+    new_msg["attributes"]["contacts"] = ",".join(emails)
+
+
+# Registry fields of OIDC clients
+OIDC_FIELDS = (
+    ("client_id", set_client_id),
+    ("redirect_uris", set_field("redirectUris")),
+    ("scope", set_optional_client_scopes),
+    ("grant_types", set_grant_types),
+    ("token_endpoint_auth_method", set_token_endpoint_auth_method),
+    ("client_secret", set_field("secret")),
+    ("token_endpoint_auth_signing_alg", set_field("token.endpoint.auth.signing.alg", attribute=True)),
+    ("jwks", set_jwks),
+    ("jwks_uri", set_jwks_uri),
+    ("refresh_token_validity_seconds", set_refresh_token_validity),
+    ("code_challenge_method", set_field("pkce.code.challenge.method", attribute=True)),
+    ("access_token_validity_seconds", set_access_token_validity),
+    ("id_token_timeout_seconds", set_field("id.token.lifespan", str, attribute=True)),
+    ("device_code_validity_seconds", set_field("oauth2.device.code.lifespan", str, attribute=True)),
+)
+
+# Registry fields of SAML clients
+SAML_FIELDS = (
+    ("metadata_url", set_field("saml.metadata.url", attribute=True)),
+    ("entity_id", set_field("clientId")),
+    ("requested_attributes", set_requested_attributes),
+)
+
+# Registry fields of any type of client
+COMMON_FIELDS = (
+    ("service_name", set_field("name")),
+    ("logo_uri", set_field("logoUri", attribute=True)),
+    ("website_url", set_field("baseUrl")),
+    ("service_description", set_field("description")),
+    ("country", set_field("country", str.upper, attribute=True)),
+    ("policy_uri", set_field("policyUri", attribute=True)),
+    ("aup_uri", set_field("tosUri", attribute=True)),
+    ("contacts", set_contacts),
+)
+
+
+def compile_fields(*field_tables):
+    handlers = {}
+    for field_table in field_tables:
+        for field, handler in field_table:
+            handlers[field] = handler
+    return handlers
+
+
+OIDC_HANDLERS = compile_fields(OIDC_FIELDS, COMMON_FIELDS)
+SAML_HANDLERS = compile_fields(SAML_FIELDS, COMMON_FIELDS)
+
+"""
+Translate a registry message to a Keycloak client representation
+
+Parameters:
+    msg (dict): The registry message, it is left unchanged
+    realm_default_client_scopes (list): The names of the realm default client scopes of the protocol
+    keycloak_config (dict): Keycloak's config options
+
+Returns:
+    new_msg (dict): The client representation
+"""
+
+
+def translate(msg, realm_default_client_scopes, keycloak_config):
+    protocol = msg.get("protocol")
+    if protocol == "oidc":
+        new_msg = copy_template(OIDC_TEMPLATE)
+        new_msg["defaultClientScopes"] = list(realm_default_client_scopes)
+        new_msg["protocol"] = "openid-connect"
+        if "oidc_consent" in keycloak_config:
+            new_msg["consentRequired"] = keycloak_config["oidc_consent"]
+        else:
+            new_msg["consentRequired"] = False
+        handlers = OIDC_HANDLERS
+    elif protocol == "saml":
+        new_msg = copy_template(SAML_TEMPLATE)
+        new_msg["protocol"] = "saml"
+        if "saml_consent" in keycloak_config:
+            new_msg["consentRequired"] = keycloak_config["saml_consent"]
+        else:
+            new_msg["consentRequired"] = True
+        handlers = SAML_HANDLERS
+    else:
+        raise ValueError("Unsupported protocol: " + str(protocol))
+
+    for field, value in msg.items():
+        handler = handlers.get(field)
+        if handler is not None:
+            handler(new_msg, value, msg, realm_default_client_scopes)
+    return new_msg
+
+
+"""
+Translate a batch of registry messages to Keycloak client representations
+
+Parameters:
+    msgs (list): The registry messages, they are left unchanged
+    realm_default_client_scopes (dict): The names of the realm default client scopes by protocol,
+    i.e. "openid-connect" and "saml"
+    keycloak_config (dict): Keycloak's config options
+
+Returns:
+    new_msgs (list): The client representations in the order of the messages
+"""
+
+
+def translate_many(msgs, realm_default_client_scopes, keycloak_config):
+    new_msgs = []
+    for msg in msgs:
+        protocol = "openid-connect" if msg.get("protocol") == "oidc" else msg.get("protocol")
+        new_msgs.append(translate(msg, realm_default_client_scopes.get(protocol, []), keycloak_config))
+    return new_msgs
@@ -0,0 +1,108 @@
+import threading
+import time
+
+"""
+Caches realm level metadata that every deployment needs, namely the realm
+default client scopes per protocol and the client scope name to id map
+
+"""
+
+
+class RealmMetadataCache:
+
+    """
+    Class constructor
+
+    Parameters:
+        ttl (float): The number of seconds a cached entry stays valid, `0` disables the cache
+
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.default_client_scopes = None
+        self.default_client_scopes_at = 0
+        self.client_scopes = None
+        self.client_scopes_at = 0
+
+    def is_fresh(self, cached_at):
+        return time.monotonic() - cached_at < self.ttl
+
+    """
+    Get the cached realm default client scopes of a protocol
+
+    Parameters:
+        protocol (str): The protocol of the client scopes
+
+    Returns:
+        client_scopes (list): The client scope representations, else `None` if they are not cached
+    """
+
+    def get_default_client_scopes(self, protocol):
+        with self.lock:
+            if self.default_client_scopes is None or not self.is_fresh(self.default_client_scopes_at):
+                return None
+            return list(self.default_client_scopes.get(protocol, []))
+
+    """
+    Cache the realm default client scopes of every protocol
+
+    Parameters:
+        client_scopes (list): The client scope representations returned by Keycloak
+    """
+
+    def set_default_client_scopes(self, client_scopes):
+        by_protocol = {}
+        for client_scope in client_scopes:
+            by_protocol.setdefault(client_scope["protocol"], []).append(client_scope)
+        with self.lock:
+            self.default_client_scopes = by_protocol
+            self.default_client_scopes_at = time.monotonic()
+
+    """
+    Get the cached realm client scopes
+
+    Returns:
+        client_scopes (dict): The client scope ids by name, else `None` if they are not cached
+    """
+
+    def get_client_scopes(self):
+        with self.lock:
+            if self.client_scopes is None or not self.is_fresh(self.client_scopes_at):
+                return None
+            return dict(self.client_scopes)
+
+    """
+    Cache the realm client scopes
+
+    Parameters:
+        client_scopes (dict): The client scope ids by name
+    """
+
+    def set_client_scopes(self, client_scopes):
+        with self.lock:
+            self.client_scopes = dict(client_scopes)
+            self.client_scopes_at = time.monotonic()
+
+    """
+    Add a newly created client scope to the cached realm client scopes
+
+    Parameters:
+        name (str): The name of the client scope
+        client_scope_id (str): The id of the client scope
+    """
+
+    def add_client_scope(self, name, client_scope_id):
+        with self.lock:
+            if self.client_scopes is not None:
+                self.client_scopes[name] = client_scope_id
+
+    """
+    Drop every cached entry
+    """
+
+    def invalidate(self):
+        with self.lock:
+            self.default_client_scopes = None
+            self.client_scopes = None
@@ -1,4 +1,8 @@
-import requests
+import codecs
+import json
+
+from MitreidConnect.MitreidClientIndex import MitreidClientIndex
+from Utils.transport import HttpTransport
 
 """
 Manages all clients on MITREid Connect
@@ -14,12 +18,30 @@ class mitreidClientApi:
     Parameters:
         issuer (str): The URI of the Authorization Server
         token  (str): An access token with admin privileges
+        session (requests.Session): A pooled session to reuse, a new one is created if omitted
+        timeout (float): The connect and read timeout of a request in seconds
+        client_index_ttl (float): The number of seconds the indexed client list stays valid, `0` disables the index
+        token_manager (TokenManager): Renews the access token when it expires or is rejected, else `None`
 
     """
 
-    def __init__(self, issuer, token):
+    def __init__(self, issuer, token, session=None, timeout=5, client_index_ttl=300, token_manager=None):
         self.issuer = issuer
+        self.transport = HttpTransport(session, timeout, timeout, token_manager=token_manager)
+        self.session = self.transport.session
+        self.client_index = MitreidClientIndex(client_index_ttl)
+        self.set_token(token)
+
+    """
+    Replace the access token used by the pooled session
+
+    Parameters:
+        token  (str): An access token with admin privileges
+    """
+
+    def set_token(self, token):
         self.token = token
+        self.session.headers["Authorization"] = "Bearer " + token
 
     """
     Get all registered clients
@@ -30,57 +52,89 @@ class mitreidClientApi:
 
     def getClients(self):
         url = self.issuer + "/api/clients"
-        header = {"Authorization": "Bearer " + self.token}
+        response = self.transport.request("GET", url)
+        if response["status"] == 200 and self.client_index.ttl > 0:
+            self.client_index.load(response["response"])
+        return response
 
-        try:
-            response = requests.get(url, headers=header, timeout=5)
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as errh:
-            print("Http Error: %s with error: %s" % (url, repr(errh)))
-            return {"status": response.status_code, "error": repr(errh)}
-        except requests.exceptions.ConnectionError as errc:
-            print("Error Connecting: %s with error: %s" % (url, repr(errc)))
-            return {"status": response.status_code, "error": repr(errc)}
-        except requests.exceptions.Timeout as errt:
-            print("Timeout Error: %s with error: %s" % (url, repr(errt)))
-            return {"status": response.status_code, "error": repr(errt)}
-        except requests.exceptions.RequestException as err:
-            print("Failed to make request to %s with error: %s" % (url, err))
-            return {"status": response.status_code, "error": repr(err)}
+    """
+    Iterate over all registered clients, decoding them while the response is received
 
-        return {"status": response.status_code, "response": response.json()}
+    Returns:
+        clients (generator): The registered clients in JSON format
 
+    Raises:
+        requests.exceptions.RequestException: If the clients could not be fetched
+        ValueError: If the response is not a JSON array
     """
-    Get a registered client by ID
+
+    def iterClients(self):
+        url = self.issuer + "/api/clients"
+        response = self.transport.stream("GET", url)
+        with response:
+            yield from iter_json_array(response.iter_content(CHUNK_SIZE))
+
+    """
+    Load the client index, unless it holds a client list that is still valid
+
+    Raises:
+        requests.exceptions.RequestException: If the clients could not be fetched
+        ValueError: If the response is not a JSON array
+    """
+
+    def loadClientIndex(self):
+        if not self.client_index.is_fresh():
+            self.client_index.load(self.iterClients())
+
+    """
+    Find a registered client by client ID using the client index
+
+    Parameters:
+        client_id (str): The clientId of the client
+
+    Returns:
+        client (JSON Object): The registered client in JSON format, else `None` if there is no such client
+    """
+
+    def findClientByClientId(self, client_id):
+        self.loadClientIndex()
+        return self.client_index.get_by_client_id(client_id)
+
+    """
+    Get a registered client by ID using the client index
 
     Parameters:
         id (str): The id of the client
-    
+
+    Returns:
+        client (JSON Object): The registered client in JSON format, else `None` if there is no such
+        client or the index is disabled
+    """
+
+    def getIndexedClient(self, id):
+        if self.client_index.ttl <= 0:
+            return None
+        self.loadClientIndex()
+        return self.client_index.get(id)
+
+    """
+    Get a registered client by ID from MITREid Connect, refreshing its indexed copy
+
+    Parameters:
+        id (str): The id of the client
+
     Returns:
-        response (JSON Object): A registered client in JSON format
+        response (JSON Object): The registered client in JSON format
     """
 
     def getClientById(self, id):
         url = self.issuer + "/api/clients/" + str(id)
-        header = {"Authorization": "Bearer " + self.token}
-
-        try:
-            response = requests.get(url, headers=header, timeout=5)
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as errh:
-            print("Http Error: %s with error: %s" % (url, repr(errh)))
-            return {"status": response.status_code, "error": repr(errh)}
-        except requests.exceptions.ConnectionError as errc:
-            print("Error Connecting: %s with error: %s" % (url, repr(errc)))
-            return {"status": response.status_code, "error": repr(errc)}
-        except requests.exceptions.Timeout as errt:
-            print("Timeout Error: %s with error: %s" % (url, repr(errt)))
-            return {"status": response.status_code, "error": repr(errt)}
-        except requests.exceptions.RequestException as err:
-            print("Failed to make request to %s with error: %s" % (url, err))
-            return {"status": response.status_code, "error": repr(err)}
-
-        return {"status": response.status_code, "response": response.json()}
+        response = self.transport.request("GET", url)
+        if response["status"] == 200:
+            self.client_index.put(response["response"])
+        elif response["status"] == 404:
+            self.client_index.remove(id)
+        return response
 
     """
     Register new client
@@ -94,28 +148,11 @@ class mitreidClientApi:
 
     def createClient(self, clientObject):
         url = self.issuer + "/api/clients"
-        header = {
-            "Authorization": "Bearer " + self.token,
-            "Content-Type": "application/json",
-        }
-
-        try:
-            response = requests.post(url, headers=header, json=clientObject, timeout=5)
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as errh:
-            print("Http Error: %s with error: %s" % (url, repr(errh)))
-            return {"status": response.status_code, "error": repr(errh)}
-        except requests.exceptions.ConnectionError as errc:
-            print("Error Connecting: %s with error: %s" % (url, repr(errc)))
-            return {"status": response.status_code, "error": repr(errc)}
-        except requests.exceptions.Timeout as errt:
-            print("Timeout Error: %s with error: %s" % (url, repr(errt)))
-            return {"status": response.status_code, "error": repr(errt)}
-        except requests.exceptions.RequestException as err:
-            print("Failed to make request to %s with error: %s" % (url, err))
-            return {"status": response.status_code, "error": repr(err)}
-
-        return {"status": response.status_code, "response": response.json()}
+        header = {"Content-Type": "application/json"}
+        response = self.transport.request("POST", url, headers=header, json=clientObject)
+        if response["status"] in (200, 201):
+            self.client_index.put(response["response"])
+        return response
 
     """
     Update an existing client by ID
@@ -130,28 +167,11 @@ class mitreidClientApi:
 
     def updateClientById(self, id, clientObject):
         url = self.issuer + "/api/clients/" + str(id)
-        header = {
-            "Authorization": "Bearer " + self.token,
-            "Content-Type": "application/json",
-        }
-
-        try:
-            response = requests.put(url, headers=header, json=clientObject, timeout=5)
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as errh:
-            print("Http Error: %s with error: %s" % (url, repr(errh)))
-            return {"status": response.status_code, "error": repr(errh)}
-        except requests.exceptions.ConnectionError as errc:
-            print("Error Connecting: %s with error: %s" % (url, repr(errc)))
-            return {"status": response.status_code, "error": repr(errc)}
-        except requests.exceptions.Timeout as errt:
-            print("Timeout Error: %s with error: %s" % (url, repr(errt)))
-            return {"status": response.status_code, "error": repr(errt)}
-        except requests.exceptions.RequestException as err:
-            print("Failed to make request to %s with error: %s" % (url, err))
-            return {"status": response.status_code, "error": repr(err)}
-
-        return {"status": response.status_code, "response": response.json()}
+        header = {"Content-Type": "application/json"}
+        response = self.transport.request("PUT", url, headers=header, json=clientObject)
+        if response["status"] == 200:
+            self.client_index.put(response["response"])
+        return response
 
     """
     Delete a registered client by ID
@@ -165,22 +185,59 @@ class mitreidClientApi:
 
     def deleteClientById(self, id):
         url = self.issuer + "/api/clients/" + str(id)
-        header = {"Authorization": "Bearer " + self.token}
-
-        try:
-            response = requests.delete(url, headers=header, timeout=5)
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as errh:
-            print("Http Error: %s with error: %s" % (url, repr(errh)))
-            return {"status": response.status_code, "error": repr(errh)}
-        except requests.exceptions.ConnectionError as errc:
-            print("Error Connecting: %s with error: %s" % (url, repr(errc)))
-            return {"status": response.status_code, "error": repr(errc)}
-        except requests.exceptions.Timeout as errt:
-            print("Timeout Error: %s with error: %s" % (url, repr(errt)))
-            return {"status": response.status_code, "error": repr(errt)}
-        except requests.exceptions.RequestException as err:
-            print("Failed to make request to %s with error: %s" % (url, err))
-            return {"status": response.status_code, "error": repr(err)}
-
-        return {"status": response.status_code, "response": "OK"}
+        response = self.transport.request("DELETE", url)
+        if response["status"] in (200, 204, 404):
+            self.client_index.remove(id)
+        return response
+
+
+# The size in bytes of the chunks a streamed response is read in
+CHUNK_SIZE = 65536
+
+"""
+Decode the items of a JSON array while its text is received
+
+Parameters:
+    chunks (iterable): The UTF-8 encoded chunks of the JSON array
+
+Returns:
+    items (generator): The decoded items of the array
+
+Raises:
+    ValueError: If the text is not a JSON array
+"""
+
+
+def iter_json_array(chunks):
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    started = False
+    for chunk in chunks:
+        buffer += text_decoder.decode(chunk)
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("The response is not a JSON array")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                # The item is not received in full yet
+                break
+            if end == len(buffer):
+                # A number could continue in the next chunk
+                break
+            yield item
+            position = end
+        buffer = buffer[position:]
+    raise ValueError("The JSON array is incomplete")
@@ -0,0 +1,132 @@
+import threading
+import time
+
+"""
+Indexes the clients of MITREid Connect by `id` and by `clientId`
+
+The client list is loaded once and kept up to date with the clients created,
+updated and deleted by the agent, so that clients can be looked up without a
+request to MITREid Connect.
+
+"""
+
+
+class MitreidClientIndex:
+
+    """
+    Class constructor
+
+    Parameters:
+        ttl (float): The number of seconds the loaded client list stays valid, `0` disables the index
+
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.clients = None
+        self.client_ids = {}
+        self.loaded_at = 0
+
+    """
+    Whether the index holds a client list that is still valid
+
+    Returns:
+        fresh (bool): `True` if clients can be looked up in the index
+    """
+
+    def is_fresh(self):
+        with self.lock:
+            return self.clients is not None and time.monotonic() - self.loaded_at < self.ttl
+
+    """
+    Replace the indexed clients
+
+    Parameters:
+        clients (iterable): The client representations of MITREid Connect
+    """
+
+    def load(self, clients):
+        by_id = {}
+        client_ids = {}
+        for client in clients:
+            by_id[str(client["id"])] = client
+            client_ids[client.get("clientId")] = str(client["id"])
+        with self.lock:
+            self.clients = by_id
+            self.client_ids = client_ids
+            self.loaded_at = time.monotonic()
+
+    """
+    Get an indexed client by ID
+
+    Parameters:
+        id (str): The id of the client
+
+    Returns:
+        client (JSON Object): The client representation, else `None` if it is not indexed
+    """
+
+    def get(self, id):
+        with self.lock:
+            if self.clients is None:
+                return None
+            return self.clients.get(str(id))
+
+    """
+    Get an indexed client by client ID
+
+    Parameters:
+        client_id (str): The clientId of the client
+
+    Returns:
+        client (JSON Object): The client representation, else `None` if it is not indexed
+    """
+
+    def get_by_client_id(self, client_id):
+        with self.lock:
+            if self.clients is None or client_id not in self.client_ids:
+                return None
+            return self.clients.get(self.client_ids[client_id])
+
+    """
+    Add a created or updated client to the index
+
+    Parameters:
+        client (JSON Object): The client representation returned by MITREid Connect
+    """
+
+    def put(self, client):
+        with self.lock:
+            if self.clients is None:
+                return
+            key = str(client["id"])
+            previous = self.clients.get(key)
+            if previous is not None and self.client_ids.get(previous.get("clientId")) == key:
+                del self.client_ids[previous.get("clientId")]
+            self.clients[key] = client
+            self.client_ids[client.get("clientId")] = key
+
+    """
+    Remove a deleted client from the index
+
+    Parameters:
+        id (str): The id of the client
+    """
+
+    def remove(self, id):
+        with self.lock:
+            if self.clients is None:
+                return
+            client = self.clients.pop(str(id), None)
+            if client is not None and self.client_ids.get(client.get("clientId")) == str(id):
+                del self.client_ids[client.get("clientId")]
+
+    """
+    Drop the indexed clients
+    """
+
+    def invalidate(self):
+        with self.lock:
+            self.clients = None
+            self.client_ids = {}
@@ -0,0 +1,122 @@
+import logging
+from datetime import datetime
+from functools import lru_cache
+
+"""
+Translates registry messages to MITREid Connect client representations
+
+Registry fields are converted from snake_case to camelCase once per field name
+and then renamed or converted following the tables below.
+
+"""
+
+# Setup logger
+log = logging.getLogger(__name__)
+
+TOKEN_ENDPOINT_AUTH_METHODS = {
+    "client_secret_post": "SECRET_POST",
+    "client_secret_basic": "SECRET_BASIC",
+    "client_secret_jwt": "SECRET_JWT",
+    "private_key_jwt": "PRIVATE_KEY",
+    "none": "NONE",
+}
+
+# Client fields that are named differently in MITREid Connect, in the order they are applied
+RENAMED_FIELDS = (
+    ("serviceName", "clientName"),
+    ("serviceDescription", "clientDescription"),
+    ("idTokenTimeoutSeconds", "idTokenValiditySeconds"),
+    ("aupUri", "tosUri"),
+    ("websiteUrl", "clientUri"),
+)
+RENAMED_FIELD_NAMES = frozenset(field for field, _ in RENAMED_FIELDS)
+
+# Client fields that are not sent to MITREid Connect
+DROPPED_FIELDS = frozenset(["externalId"])
+
+
+def map_token_endpoint_value(key):
+    return TOKEN_ENDPOINT_AUTH_METHODS.get(key)
+
+
+"""
+Convert a registry field name from snake_case to camelCase
+
+Parameters:
+    key (str): The registry field name
+
+Returns:
+    key (str): The field name in camelCase
+"""
+
+
+@lru_cache(maxsize=1024)
+def to_camel_case(key):
+    components = key.split("_")
+    return components[0] + "".join(x.title() for x in components[1:])
+
+
+def format_created_at(created_at):
+    try:
+        d = datetime.strptime(created_at[:19], "%Y-%m-%dT%H:%M:%S")
+        return d.strftime("%Y-%m-%dT%H:%M:%S+0000")
+    except ValueError as err:
+        log.critical(err)
+        return created_at
+
+
+"""
+Translate a registry message to a MITREid Connect client representation
+
+Parameters:
+    msg (dict): The registry message, it is left unchanged
+    deployment_type (str): The deployment type of the message, "create", "edit" or "delete"
+
+Returns:
+    new_msg (dict): The client representation
+"""
+
+
+def translate(msg, deployment_type):
+    new_msg = {}
+    renamed = {}
+    for key, value in msg.items():
+        new_key = to_camel_case(key)
+        if new_key in RENAMED_FIELD_NAMES:
+            renamed[new_key] = value
+        elif new_key not in DROPPED_FIELDS:
+            new_msg[new_key] = value
+
+    emails = []
+    for contact in msg["contacts"]:
+        if contact["type"] == "technical" or contact["type"] == "support":
+            emails.append(contact["email"])
+    new_msg["contacts"] = emails
+
+    if "createdAt" in new_msg:
+        if deployment_type == "create":
+            new_msg.pop("createdAt")
+        elif deployment_type == "edit":
+            new_msg["createdAt"] = format_created_at(new_msg["createdAt"])
+    if "tokenEndpointAuthMethod" in new_msg:
+        new_msg["tokenEndpointAuthMethod"] = map_token_endpoint_value(new_msg["tokenEndpointAuthMethod"])
+    for field, new_field in RENAMED_FIELDS:
+        if field in renamed:
+            new_msg[new_field] = renamed[field]
+    return new_msg
+
+
+"""
+Translate a batch of registry messages to MITREid Connect client representations
+
+Parameters:
+    msgs (list): The registry messages, they are left unchanged
+    deployment_type (str): The deployment type of the messages, "create", "edit" or "delete"
+
+Returns:
+    new_msgs (list): The client representations in the order of the messages
+"""
+
+
+def translate_many(msgs, deployment_type):
+    return [translate(msg, deployment_type) for msg in msgs]
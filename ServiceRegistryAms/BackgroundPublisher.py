@@ -0,0 +1,126 @@
+import logging
+import queue
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+"""
+Publishes messages to AMS from a background thread
+
+Messages handed to the publisher are queued and flushed to the publish topic in
+chunks, so that a slow or failing AMS does not block the deployment of the next
+batch. Failed flushes are retried with an exponential backoff while new messages
+keep being queued. A chunk that still fails after `publish_max_attempts` attempts is
+dropped, so that a permanently failing AMS does not block the deployments.
+
+"""
+
+_STOP = object()
+
+
+class BackgroundPublisher:
+
+    """
+    Class constructor
+
+    Parameters:
+        ams_agent (PullPublish): The AMS agent that publishes the messages
+        config (dict): The AMS config options
+
+    """
+
+    def __init__(self, ams_agent, config):
+        self.ams_agent = ams_agent
+        self.max_batch_size = config.get("publish_batch_size", 100)
+        self.flush_interval = config.get("publish_flush_interval", 1)
+        self.retry_interval = config.get("publish_retry_interval", 5)
+        self.max_retry_interval = config.get("publish_max_retry_interval", 60)
+        self.max_attempts = config.get("publish_max_attempts", 10)
+        self.queue = queue.Queue(maxsize=config.get("publish_queue_size", 1000))
+        self.closing = False
+        self.thread = threading.Thread(target=self.run, name="ams-publisher", daemon=True)
+        self.thread.start()
+
+    """
+    Queue messages to be published
+
+    Blocks only while the queue is full.
+
+    Parameters:
+        messages (list): The messages to be published in the format of PullPublish.publish
+    """
+
+    def publish(self, messages):
+        for message in messages:
+            self.queue.put(message)
+
+    """
+    Flush the queued messages and stop the background thread
+
+    Parameters:
+        timeout (float): The number of seconds to wait for the queue to be flushed
+    """
+
+    def close(self, timeout=30):
+        if not self.thread.is_alive():
+            return
+        self.closing = True
+        self.queue.put(_STOP)
+        self.thread.join(timeout)
+
+    def run(self):
+        while True:
+            chunk, stop = self.collect()
+            if chunk:
+                self.flush(chunk)
+            if stop:
+                return
+
+    # Collect messages until the chunk is full or `flush_interval`
+    # seconds have passed since the first message of the chunk
+    def collect(self):
+        item = self.queue.get()
+        if item is _STOP:
+            return [], True
+        chunk = [item]
+        flush_at = time.monotonic() + self.flush_interval
+        while len(chunk) < self.max_batch_size:
+            remaining = flush_at - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return chunk, True
+            chunk.append(item)
+        return chunk, False
+
+    def flush(self, chunk):
+        delay = self.retry_interval
+        attempt = 1
+        while True:
+            try:
+                if self.ams_agent.publish(chunk):
+                    log.debug("Published " + str(len(chunk)) + " messages to ams")
+                    return
+            except (Exception, SystemExit):
+                # PullPublish exits when the topic cannot be checked, which
+                # must not terminate the publisher thread
+                log.exception("Unexpected error while publishing to ams")
+            if self.closing or attempt >= self.max_attempts:
+                log.error(
+                    "Drop "
+                    + str(len(chunk))
+                    + " messages that could not be published to ams after "
+                    + str(attempt)
+                    + " attempts: "
+                    + str(chunk)
+                )
+                return
+            log.warning("Failed to publish " + str(len(chunk)) + " messages to ams, retry in " + str(delay) + "s")
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_retry_interval)
+            attempt += 1
@@ -0,0 +1,58 @@
+"""
+Adapts the number of messages pulled from AMS per poll cycle
+
+"""
+
+
+class BatchSizeController:
+
+    """
+    Class constructor
+
+    Parameters:
+        max_batch_size (int): The upper bound of messages pulled per poll cycle
+        min_batch_size (int): The lower bound of messages pulled per poll cycle
+        target_batch_latency (float): Deploy latency of a batch in seconds above which the batch shrinks
+
+    """
+
+    def __init__(self, max_batch_size=1, min_batch_size=1, target_batch_latency=30):
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.min_batch_size = max(1, min(int(min_batch_size), self.max_batch_size))
+        self.target_batch_latency = target_batch_latency
+        self.batch_size = self.min_batch_size
+        self.backlog = False
+
+    """
+    Record the outcome of a pull
+
+    A batch that came back full means that the subscription still has backlog,
+    so the batch is allowed to grow on the next successful deployment.
+
+    Parameters:
+        requested (int): The number of messages requested from AMS
+        received (int): The number of messages returned by AMS
+    """
+
+    def record_pull(self, requested, received):
+        self.backlog = received >= requested > 0
+
+    """
+    Record the time it took to deploy the last pulled batch
+
+    The batch size is halved when the latency exceeds the target and doubled
+    while there is backlog and the backend keeps up.
+
+    Parameters:
+        latency (float): The deploy latency of the last batch in seconds
+
+    Returns:
+        batch_size (int): The batch size to be used on the next pull
+    """
+
+    def record_latency(self, latency):
+        if latency > self.target_batch_latency:
+            self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+        elif self.backlog:
+            self.batch_size = min(self.max_batch_size, self.batch_size * 2)
+        return self.batch_size
@@ -0,0 +1,83 @@
+import threading
+import time
+
+"""
+Remembers for a limited time which AMS subscriptions and topics are known to exist
+
+"""
+
+
+class MetadataCache:
+
+    """
+    Class constructor
+
+    Parameters:
+        ttl (float): The number of seconds an existence check stays valid
+
+    """
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    """
+    Check whether a resource is known to exist
+
+    Parameters:
+        kind (str): The kind of the resource, "sub" or "topic"
+        name (str): The name of the resource
+
+    Returns:
+        known (bool): True if the resource was seen within the ttl
+    """
+
+    def is_known(self, kind, name):
+        with self.lock:
+            checked_at = self.entries.get((kind, name))
+            if checked_at is not None and time.monotonic() - checked_at < self.ttl:
+                self.stats["hits"] += 1
+                return True
+            self.stats["misses"] += 1
+            return False
+
+    """
+    Mark a resource as existing
+
+    Parameters:
+        kind (str): The kind of the resource, "sub" or "topic"
+        name (str): The name of the resource
+    """
+
+    def remember(self, kind, name):
+        with self.lock:
+            self.entries[(kind, name)] = time.monotonic()
+
+    """
+    Forget a resource, e.g. after AMS reported it as not found
+
+    Parameters:
+        kind (str): The kind of the resource, "sub" or "topic"
+        name (str): The name of the resource
+    """
+
+    def invalidate(self, kind, name):
+        with self.lock:
+            if self.entries.pop((kind, name), None) is not None:
+                self.stats["invalidations"] += 1
+
+    """
+    Get the cache counters
+
+    Returns:
+        stats (dict): The hits, misses and invalidations of the cache. Every hit
+        is an existence check round-trip to AMS that was saved
+    """
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats["saved_round_trips"] = stats["hits"]
+        return stats
@@ -0,0 +1,70 @@
+import random
+import time
+
+"""
+Schedules the next AMS poll based on the outcome of the previous one
+
+"""
+
+
+class PollScheduler:
+
+    """
+    Class constructor
+
+    Parameters:
+        poll_interval (float): The delay in seconds after a batch that drained the subscription
+        max_poll_interval (float): The upper bound of the delay in seconds while the subscription is empty
+        backoff_factor (float): The factor the delay is multiplied by after every empty poll
+        jitter (float): The fraction of the delay that is randomized to spread the polls of different agents
+
+    """
+
+    def __init__(self, poll_interval=1, max_poll_interval=30, backoff_factor=2, jitter=0.1):
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max(poll_interval, max_poll_interval)
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.empty_polls = 0
+
+    """
+    Calculate the delay before the next poll
+
+    Parameters:
+        received (int): The number of messages returned by the last poll
+        full (bool): True if the last poll returned a full batch
+
+    Returns:
+        delay (float): The delay in seconds
+    """
+
+    def next_delay(self, received, full):
+        if full:
+            self.empty_polls = 0
+            return 0
+        if received > 0:
+            self.empty_polls = 0
+            return self.poll_interval
+
+        self.empty_polls += 1
+        delay = self.poll_interval
+        for _ in range(self.empty_polls - 1):
+            delay *= self.backoff_factor
+            if delay >= self.max_poll_interval:
+                break
+        delay = min(delay, self.max_poll_interval)
+        delay += delay * random.uniform(-self.jitter, self.jitter)
+        return max(0, min(delay, self.max_poll_interval))
+
+    """
+    Sleep until the next poll is due
+
+    Parameters:
+        received (int): The number of messages returned by the last poll
+        full (bool): True if the last poll returned a full batch
+    """
+
+    def wait(self, received, full):
+        delay = self.next_delay(received, full)
+        if delay > 0:
+            time.sleep(delay)
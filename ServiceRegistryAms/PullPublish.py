@@ -1,6 +1,9 @@
 import json
 
-from argo_ams_library import AmsException, AmsMessage, ArgoMessagingService
+from argo_ams_library import AmsException, AmsMessage, AmsServiceException, ArgoMessagingService
+
+from ServiceRegistryAms.BatchSizeController import BatchSizeController
+from ServiceRegistryAms.MetadataCache import MetadataCache
 
 
 class PullPublish:
@@ -9,29 +12,82 @@ class PullPublish:
         self.pub_topic = config["pub_topic"]
         self.pull_topic = config["pull_topic"]
         self.ams = ArgoMessagingService(endpoint=config["host"], token=config["token"], project=config["project"])
+        self.batch_controller = BatchSizeController(
+            config.get("max_batch_size", 10),
+            config.get("min_batch_size", 1),
+            config.get("target_batch_latency", 30),
+        )
+        self.metadata_cache = MetadataCache(config.get("metadata_cache_ttl", 3600))
 
-    def pull(self, nummsgs):
+    # pull gets up to `nummsgs` messages from the subscription. When `nummsgs`
+    # is omitted the batch size is chosen by the adaptive batch controller
+    def pull(self, nummsgs=None):
+        if nummsgs is None:
+            nummsgs = self.batch_controller.batch_size
         messages = []
-        try:
-            if not self.ams.has_sub(self.pull_sub):
-                self.ams.create_sub(self.pull_sub, self.pull_topic)
-        except AmsException as e:
-            print(e)
-            raise SystemExit(1)
+        self.ensure_sub()
 
         # try to pull number of messages from subscription. method will
         # return (ackIds, AmsMessage) tuples from which ackIds and messages
         # payload will be extracted.
+        try:
+            received = self.ams.pull_sub(self.pull_sub, nummsgs)
+        except AmsServiceException as e:
+            if getattr(e, "code", None) != 404:
+                raise
+            # The subscription was removed since it was last checked
+            self.metadata_cache.invalidate("sub", self.pull_sub)
+            self.ensure_sub()
+            received = self.ams.pull_sub(self.pull_sub, nummsgs)
         ackids = list()
-        for id, msg in self.ams.pull_sub(self.pull_sub, nummsgs):
+        for id, msg in received:
             data = msg.get_data()
             # msgid = msg.get_msgid()
             # attr = msg.get_attr()
             messages.append(json.loads(data.decode("utf-8")))
             # print('msgid={0}, data={1}, attr={2}'.format(msgid, data, attr))
             ackids.append(id)
+        self.batch_controller.record_pull(nummsgs, len(messages))
         return messages, ackids
 
+    # Create the pull subscription unless it is known to exist
+    def ensure_sub(self):
+        if self.metadata_cache.is_known("sub", self.pull_sub):
+            return
+        try:
+            if not self.ams.has_sub(self.pull_sub):
+                self.ams.create_sub(self.pull_sub, self.pull_topic)
+        except AmsException as e:
+            print(e)
+            raise SystemExit(1)
+        self.metadata_cache.remember("sub", self.pull_sub)
+
+    # Create the publish topic unless it is known to exist
+    def ensure_topic(self):
+        if self.metadata_cache.is_known("topic", self.pub_topic):
+            return
+        try:
+            if not self.ams.has_topic(self.pub_topic):
+                self.ams.create_topic(self.pub_topic)
+        except AmsException as e:
+            print(e)
+            raise SystemExit(1)
+        self.metadata_cache.remember("topic", self.pub_topic)
+
+    # Counters of the subscription/topic existence cache
+    def metadata_stats(self):
+        return self.metadata_cache.get_stats()
+
+    # True when the last pull returned a full batch, i.e. more
+    # messages are likely waiting in the subscription
+    def has_backlog(self):
+        return self.batch_controller.backlog
+
+    # Report how long the last pulled batch took to deploy so that
+    # the size of the next batch can be adapted
+    def record_latency(self, latency):
+        return self.batch_controller.record_latency(latency)
+
     def ack(self, ackids):
         # pass list of extracted ackIds to AMS Service so that
         # it can move the offset for the next subscription pull
@@ -39,14 +95,11 @@ class PullPublish:
         if ackids:
             self.ams.ack_sub(self.pull_sub, ackids)
 
+    # publish sends the messages to the publish topic and
+    # returns False if AMS rejected them
     def publish(self, messages):
         # messages = [{data:[{id:1},{state:'deployed'}],attributes=''}]
-        try:
-            if not self.ams.has_topic(self.pub_topic):
-                self.ams.create_topic(self.pub_topic)
-        except AmsException as e:
-            print(e)
-            raise SystemExit(1)
+        self.ensure_topic()
 
         # publish one message to given topic. message is constructed with
         # help of AmsMessage which accepts data and attributes keys.
@@ -58,7 +111,17 @@ class PullPublish:
             msglist.append(msg(data=json.dumps(message["data"]), attributes={}))
 
         try:
-            ret = self.ams.publish(self.pub_topic, msglist)
+            try:
+                ret = self.ams.publish(self.pub_topic, msglist)
+            except AmsServiceException as e:
+                if getattr(e, "code", None) != 404:
+                    raise
+                # The topic was removed since it was last checked
+                self.metadata_cache.invalidate("topic", self.pub_topic)
+                self.ensure_topic()
+                ret = self.ams.publish(self.pub_topic, msglist)
             print(ret)
         except AmsException as e:
             print(e)
+            return False
+        return True
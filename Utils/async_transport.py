@@ -0,0 +1,310 @@
+import asyncio
+import logging
+import time
+from collections import namedtuple
+
+import aiohttp
+
+from Utils.deadline import DeadlineExceeded, get_remaining_time, get_request_timeout
+from Utils.limiter import parse_retry_after
+from Utils.resilience import CircuitOpenError
+from Utils.transport import (
+    FAILURE_STATUSES,
+    OVERLOAD_STATUSES,
+    RETRY_STATUSES,
+    add_token,
+    create_backend_policies,
+    get_http_error_result,
+    get_request_error_result,
+    get_response_result,
+    get_retry_delay,
+    parse_response_body,
+    report_request,
+)
+
+log = logging.getLogger(__name__)
+
+"""
+The asyncio counterpart of Utils.transport
+
+Requests are sent with aiohttp and their outcome is normalized with the helpers
+of Utils.transport, so the asyncio clients report responses and errors exactly
+like the clients that use HttpTransport.
+
+"""
+
+# A response whose body was read before its connection was released
+AsyncResponse = namedtuple("AsyncResponse", ["status", "text", "headers"])
+
+
+class AsyncBackendSession:
+
+    """
+    Class constructor
+
+    An aiohttp session for the admin API of a backend. Requests go through the
+    adaptive limiter, failed idempotent requests are retried and the circuit
+    breaker fails requests fast while the backend is down, like BackendSession.
+    The aiohttp session is opened on the first request, so that it belongs to the
+    running event loop.
+
+    Parameters:
+        max_connections (int): The maximum number of connections kept open
+        limiter (AdaptiveLimiter): The limiter of the backend, else `None`
+        retry_policy (RetryPolicy): The retry policy of the backend, else `None`
+        circuit_breaker (CircuitBreaker): The circuit breaker of the backend, else `None`
+
+    """
+
+    def __init__(self, max_connections=100, limiter=None, retry_policy=None, circuit_breaker=None):
+        self.max_connections = max_connections
+        self.limiter = limiter
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+        self.session = None
+
+    """
+    Send a request and read its response
+
+    Parameters:
+        method (str): The request method
+        url (str): The request URL
+        timeout (tuple): The connect and read timeouts of the request in seconds
+        **kwargs: The other arguments of `aiohttp.ClientSession.request`
+
+    Returns:
+        response (AsyncResponse): The status, the body and the headers of the response
+
+    Raises:
+        aiohttp.ClientError: If no response was received
+        asyncio.TimeoutError: If the request timed out
+        CircuitOpenError: If the circuit breaker fails the request fast
+        DeadlineExceeded: If the time budget of the current deadline is exhausted
+    """
+
+    async def request(self, method, url, timeout=(5, 60), **kwargs):
+        attempt = 0
+        while True:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.before_request()
+            response = None
+            error = None
+            try:
+                response = await self.send_limited(method, url, timeout, **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                error = err
+            except BaseException:
+                # Raised by the agent, e.g. DeadlineExceeded while waiting for the limiter,
+                # so it says nothing about the health of the backend
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.cancel()
+                raise
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record(response is not None and response.status not in FAILURE_STATUSES)
+
+            retry_after = None
+            if response is not None:
+                if response.status not in RETRY_STATUSES:
+                    return response
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            delay = get_retry_delay(self.retry_policy, method, attempt, retry_after)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def send_limited(self, method, url, timeout, **kwargs):
+        if self.limiter is not None:
+            # Wait for the limiter no longer than what is left of the deadline
+            if not await acquire_limiter(self.limiter, get_remaining_time()):
+                raise DeadlineExceeded("The time budget of the deployment is exhausted")
+        try:
+            # The time spent waiting is no longer available to the request
+            connect_timeout, read_timeout = get_request_timeout(*timeout)
+        except DeadlineExceeded:
+            if self.limiter is not None:
+                self.limiter.cancel()
+            raise
+        if self.session is None:
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.max_connections))
+        start = time.monotonic()
+        response = None
+        try:
+            async with self.session.request(
+                method,
+                url,
+                timeout=aiohttp.ClientTimeout(total=read_timeout, sock_connect=connect_timeout),
+                **kwargs,
+            ) as raw_response:
+                response = AsyncResponse(raw_response.status, await raw_response.text(), raw_response.headers)
+            return response
+        finally:
+            if self.limiter is not None:
+                if response is None:
+                    # The backend could not be reached or did not answer in time
+                    self.limiter.release(time.monotonic() - start, overloaded=True)
+                else:
+                    self.limiter.release(
+                        time.monotonic() - start,
+                        response.status in OVERLOAD_STATUSES,
+                        parse_retry_after(response.headers.get("Retry-After")),
+                    )
+
+    """
+    Close the connections of the session
+    """
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+"""
+Wait for a slot of an adaptive limiter without blocking the event loop
+
+The wait runs in a worker thread. If the waiting task is cancelled, a slot that
+is acquired afterwards is given back.
+
+Parameters:
+    limiter (AdaptiveLimiter): The limiter
+    timeout (float): The maximum number of seconds to wait, else `None`
+
+Returns:
+    acquired (bool): `True` if the request may start, `False` if it could not start within the timeout
+"""
+
+
+async def acquire_limiter(limiter, timeout=None):
+    if limiter.acquire(0):
+        return True
+    if timeout is not None and timeout <= 0:
+        return False
+    future = asyncio.get_running_loop().run_in_executor(None, limiter.acquire, timeout)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        future.add_done_callback(lambda done: done.result() and limiter.cancel())
+        raise
+
+
+"""
+Create an asyncio session from a config section
+
+Parameters:
+    config (dict): The `http` config options of a deployer, the same as for `create_session_from_config`
+
+Returns:
+    session (AsyncBackendSession): The session
+"""
+
+
+def create_async_session_from_config(config):
+    # The asyncio client keeps up to 100 connections open by default
+    config = dict({"pool_maxsize": 100}, **config)
+    return AsyncBackendSession(config["pool_maxsize"], *create_backend_policies(config))
+
+
+class AsyncHttpTransport:
+
+    """
+    Class constructor
+
+    Sends the requests of an asyncio backend client and normalizes their outcome
+    like `HttpTransport.request`.
+
+    Parameters:
+        session (AsyncBackendSession): The session to reuse, a new one is created if omitted
+        connect_timeout (float): The connect timeout of a request in seconds
+        read_timeout (float): The read timeout of a request in seconds
+        hooks (list): Callables invoked after every request with the method, the URL,
+        the status and the elapsed seconds
+        token_manager (TokenManager): Provides the access token of every request, else `None`.
+        A request rejected with 401 is sent once more with a renewed token
+
+    Requests made within a deadline (see Utils.deadline) never wait longer than what is left of it.
+
+    """
+
+    def __init__(self, session=None, connect_timeout=5, read_timeout=60, hooks=None, token_manager=None):
+        self.session = session if session is not None else AsyncBackendSession()
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.hooks = list(hooks) if hooks is not None else []
+        self.token_manager = token_manager
+
+    """
+    Register a callable to be invoked after every request
+
+    Parameters:
+        hook (callable): Called with the method, the URL, the status and the elapsed seconds
+    """
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    """
+    Send a request and normalize its outcome
+
+    Parameters:
+        method (str): The request method
+        url (str): The request URL
+        headers (dict): Extra request headers, else `None`
+        json (JSON Object): The request body, else `None`
+        params (dict): The query parameters, else `None`
+
+    Returns:
+        response (dict): The normalized response, see `HttpTransport.request`
+
+    Raises:
+        DeadlineExceeded: If the time budget of the current deadline is exhausted
+    """
+
+    async def request(self, method, url, headers=None, json=None, params=None):
+        token = await self.get_token()
+        result = await self.send(method, url, add_token(headers, token), json, params)
+        if result["status"] == 401 and token is not None:
+            token = await self.renew_token(url, token)
+            result = await self.send(method, url, add_token(headers, token), json, params)
+        return result
+
+    async def send(self, method, url, headers, json, params):
+        timeout = get_request_timeout(self.connect_timeout, self.read_timeout)
+        start = time.monotonic()
+        try:
+            response = await self.session.request(
+                method, url, headers=headers, json=json, params=params, timeout=timeout
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError) as err:
+            result = get_request_error_result(url, err)
+        else:
+            body = parse_response_body(response.status, response.text)
+            if response.status >= 400:
+                error = "HTTP Error " + str(response.status) + " for url: " + url
+                result = get_http_error_result(url, response.status, error, body)
+            else:
+                result = get_response_result(method, response.status, body, response.headers.get("Location"))
+        report_request(self.hooks, method, url, result["status"], time.monotonic() - start)
+        return result
+
+    # Get the access token of a request, else None. The token manager may have to renew
+    # the token, so it is called from a worker thread
+    async def get_token(self):
+        if self.token_manager is None:
+            return None
+        return await asyncio.to_thread(self.token_manager.get_token)
+
+    # Renew an access token that was rejected with 401, e.g. because it expired or was revoked
+    async def renew_token(self, url, token):
+        log.warning("The access token was rejected by %s, retry with a renewed token" % url)
+        self.token_manager.invalidate(token)
+        return await asyncio.to_thread(self.token_manager.get_token)
+
+    """
+    Close the connections of the transport
+    """
+
+    async def close(self):
+        await self.session.close()
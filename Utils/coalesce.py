@@ -0,0 +1,114 @@
+import copy
+
+from Utils.common import create_ams_response, get_deployment_keys
+from Utils.concurrency import group_by_keys
+
+# Marks a pending operation that was cancelled out, e.g. a create followed by a delete
+CANCELLED = object()
+
+"""
+Fold a message into the pending operation of its service
+
+The operations fold as follows:
+- create + edit: a create with the final state
+- edit + edit: the last edit
+- create + delete: nothing
+- edit + delete: the delete
+
+Parameters:
+    pending (dict): The pending operation of the service
+    msg (dict): The next message of the service
+
+Returns:
+    operation (dict): The folded operation, `CANCELLED` if nothing has to be deployed,
+    else `None` if the message starts a new operation
+"""
+
+
+def fold_message(pending, msg):
+    if pending is CANCELLED:
+        return None
+    pending_type = pending.get("deployment_type")
+    deployment_type = msg.get("deployment_type")
+    if pending_type == "create" and deployment_type == "edit":
+        return dict(msg, deployment_type="create")
+    if pending_type == "edit" and deployment_type in ("edit", "delete"):
+        return msg
+    if pending_type == "create" and deployment_type == "delete":
+        return CANCELLED
+    return None
+
+
+"""
+Coalesce a batch of messages into the net operations of every service
+
+Only the messages of services that do not share a `client_id` or an `entity_id`
+with another service are folded, so that the net operations can be deployed in
+any order relative to the other services.
+
+Parameters:
+    messages (list): The messages of the batch
+
+Returns:
+    operations (list): The messages to deploy, in the order of their first message
+    owners (list): The index of the operation every message was folded into, else `None`
+    if the message was cancelled out
+"""
+
+
+def coalesce_messages(messages):
+    pending = {}
+    owners = [None] * len(messages)
+    for group in group_by_keys(messages, get_deployment_keys):
+        service_ids = set(messages[index].get("id") for index in group)
+        foldable = len(service_ids) == 1 and None not in service_ids
+        current = None
+        for index in group:
+            if foldable and current is not None:
+                operation = fold_message(pending[current], messages[index])
+                if operation is not None:
+                    pending[current] = operation
+                    owners[index] = current
+                    continue
+            current = index
+            pending[index] = messages[index]
+            owners[index] = index
+
+    operations = []
+    positions = {}
+    for index in sorted(pending):
+        if pending[index] is not CANCELLED:
+            positions[index] = len(operations)
+            operations.append(pending[index])
+    return operations, [positions.get(owner) for owner in owners]
+
+
+"""
+Expand the messages to be published for the net operations back to one message
+per original message
+
+Parameters:
+    messages (list): The original messages of the batch
+    owners (list): The owners returned by `coalesce_messages`
+    pub_messages (list): The messages to be published for the operations
+    deployer_name (str): The name of the deployer
+
+Returns:
+    pub_messages (list): The messages to be published, one for every original message
+"""
+
+
+def expand_pub_messages(messages, owners, pub_messages, deployer_name):
+    expanded = []
+    used = set()
+    for index, owner in enumerate(owners):
+        if owner is None:
+            # Nothing was deployed for the message, the service ends up as requested
+            ams_message = create_ams_response({"status": 204}, messages[index]["id"], deployer_name, "", "")
+            expanded.append({"attributes": {}, "data": ams_message})
+        elif owner in used:
+            expanded.append(copy.deepcopy(pub_messages[owner]))
+        else:
+            used.add(owner)
+            expanded.append(pub_messages[owner])
+    return expanded
@@ -36,6 +36,18 @@ def create_ams_response(response, service_id, deployer_name, external_id, client
     return new_msg
 
 
+# get_deployment_keys returns the keys that identify the service of a registry
+# message. Messages that share a key must be deployed in their original order
+def get_deployment_keys(msg):
+    keys = []
+    if "id" in msg:
+        keys.append(("id", msg["id"]))
+    for field in ("client_id", "entity_id"):
+        if msg.get(field):
+            keys.append((field, msg[field]))
+    return keys
+
+
 """
 Method that creates the Keycloak issuer based on `auth_server` + `realm`
 
@@ -49,3 +61,23 @@ Returns:
 
 def get_keycloak_issuer(config):
     return config["auth_server"] + "/realms/" + config["realm"]
+
+
+# client_matches returns whether a client of a backend matches the desired client
+# representation, i.e. every desired value is present in the client. Lists of
+# values are compared as sets and booleans are compared with their string form,
+# e.g. the attributes of Keycloak clients
+def client_matches(desired, current):
+    if isinstance(desired, dict):
+        return isinstance(current, dict) and all(
+            key in current and client_matches(value, current[key]) for key, value in desired.items()
+        )
+    if isinstance(desired, list):
+        if not isinstance(current, list):
+            return False
+        if all(not isinstance(value, (dict, list)) for value in desired + current):
+            return set(desired) == set(current)
+        return all(any(client_matches(value, item) for item in current) for value in desired)
+    if isinstance(desired, bool) or isinstance(current, bool):
+        return str(desired).lower() == str(current).lower()
+    return desired == current
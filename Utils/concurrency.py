@@ -0,0 +1,150 @@
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+"""
+Wrap a worker so that it runs in a copy of the context of the caller, e.g. to
+keep the deadline of a deployment in worker threads
+
+Parameters:
+    worker (function): Processes a single item
+
+Returns:
+    worker (function): The wrapped worker
+"""
+
+
+def bind_context(worker):
+    context = contextvars.copy_context()
+    return lambda item: context.copy().run(worker, item)
+
+
+"""
+Group items that share at least one key
+
+Items are grouped transitively, i.e. if item A shares a key with item B and
+item B shares a key with item C then all three end up in the same group.
+
+Parameters:
+    items (list): The items to group
+    key_func (function): Returns the list of keys of an item
+
+Returns:
+    groups (list): Lists of item indices, each one in the original order.
+    The groups are ordered by their first item
+"""
+
+
+def group_by_keys(items, key_func):
+    parents = list(range(len(items)))
+
+    def find(index):
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    owners = {}
+    for index, item in enumerate(items):
+        for key in key_func(item):
+            if key in owners:
+                root, other = find(index), find(owners[key])
+                if root != other:
+                    parents[max(root, other)] = min(root, other)
+            else:
+                owners[key] = index
+
+    groups = {}
+    for index in range(len(items)):
+        groups.setdefault(find(index), []).append(index)
+    return list(groups.values())
+
+
+"""
+Run a worker over a list of items with bounded concurrency
+
+Items that share a key are handed to the worker strictly one after another and
+in their original order, while unrelated items run in parallel.
+
+Parameters:
+    items (list): The items to process
+    key_func (function): Returns the list of keys of an item
+    worker (function): Processes a single item and returns its result
+    max_workers (int): The maximum number of items processed in parallel
+
+Returns:
+    results (list): The results of the worker in the order of the items
+"""
+
+
+def run_in_order(items, key_func, worker, max_workers=1):
+    if max_workers <= 1 or len(items) <= 1:
+        return [worker(item) for item in items]
+
+    results = [None] * len(items)
+    worker = bind_context(worker)
+
+    def run_group(group):
+        for index in group:
+            results[index] = worker(items[index])
+
+    groups = group_by_keys(items, key_func)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(groups))) as executor:
+        for future in [executor.submit(run_group, group) for group in groups]:
+            future.result()
+    return results
+
+
+"""
+Run a worker over a list of independent items with bounded concurrency
+
+Parameters:
+    worker (function): Processes a single item and returns its result
+    items (list): The items to process
+    max_workers (int): The maximum number of items processed in parallel
+
+Returns:
+    results (list): The results of the worker in the order of the items
+"""
+
+
+def map_concurrently(worker, items, max_workers=1):
+    if max_workers <= 1 or len(items) <= 1:
+        return [worker(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(bind_context(worker), items))
+
+
+"""
+Run a worker over an iterable of independent items with bounded concurrency
+
+The items are consumed lazily and at most `max_workers` of them are in flight at
+any time, so that arbitrarily long iterables are processed in constant memory.
+
+Parameters:
+    worker (function): Processes a single item and returns its result
+    items (iterable): The items to process
+    max_workers (int): The maximum number of items processed in parallel
+
+Returns:
+    results (generator): The results of the worker in completion order
+"""
+
+
+def map_bounded(worker, items, max_workers=1):
+    if max_workers <= 1:
+        for item in items:
+            yield worker(item)
+        return
+
+    worker = bind_context(worker)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for item in items:
+            if len(pending) >= max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(executor.submit(worker, item))
+        for future in as_completed(pending):
+            yield future.result()
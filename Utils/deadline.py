@@ -0,0 +1,96 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+"""
+Time budgets for deployments
+
+A deadline is set for the deployment of a message and is carried in a context
+variable, so that every request made on its behalf draws from the same budget
+without threading it through every call. Worker threads started with the helpers
+of Utils.concurrency and asyncio tasks inherit the deadline of their caller.
+
+"""
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+
+    """
+    Class constructor
+
+    Parameters:
+        budget (float): The seconds available from now on
+
+    """
+
+    def __init__(self, budget):
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+
+current_deadline = contextvars.ContextVar("current_deadline", default=None)
+
+"""
+Run a block of code within a time budget
+
+Parameters:
+    budget (float): The seconds available to the block, `None` or `0` for no deadline
+"""
+
+
+@contextmanager
+def deadline_scope(budget):
+    if not budget:
+        yield None
+        return
+    deadline = Deadline(budget)
+    token = current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        current_deadline.reset(token)
+
+
+"""
+Get the seconds left of the current deadline
+
+Returns:
+    remaining (float): The seconds left, else `None` if there is no deadline
+"""
+
+
+def get_remaining_time():
+    deadline = current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline.remaining()
+
+
+"""
+Get the timeouts of a request from what is left of the current deadline
+
+Parameters:
+    connect_timeout (float): The connect timeout in seconds when the budget allows it
+    read_timeout (float): The read timeout in seconds when the budget allows it
+
+Returns:
+    timeout (tuple): The connect and read timeouts in seconds
+
+Raises:
+    DeadlineExceeded: If the budget is exhausted
+"""
+
+
+def get_request_timeout(connect_timeout=5, read_timeout=60):
+    remaining = get_remaining_time()
+    if remaining is None:
+        return connect_timeout, read_timeout
+    if remaining <= 0:
+        raise DeadlineExceeded("The time budget of the deployment is exhausted")
+    return min(connect_timeout, remaining), min(read_timeout, remaining)
@@ -0,0 +1,148 @@
+import hashlib
+import os
+import tempfile
+
+"""
+Atomic writes of generated files
+
+The content is rendered twice: once to compare its hash with the file on disk,
+so that an unchanged file is not written at all, and once to stream it to a
+temporary file in the same directory. The temporary file is flushed to disk and
+renamed over the target, so readers see either the old or the new file, never
+a half-written one.
+
+"""
+
+# The size in bytes of the buffer used to read and write files
+BUFFER_SIZE = 1024 * 1024
+
+
+# Reads the umask of the process. The umask can only be read by setting it, so it is
+# read once when the module is imported, before any worker thread creates files
+def read_umask():
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+# The umask of the process, applied to the mode of new files
+UMASK = read_umask()
+
+
+"""
+Get the hash of a text rendered in chunks
+
+Parameters:
+    chunks (iterable): The chunks of the text
+
+Returns:
+    digest (str): The SHA-256 hex digest of the UTF-8 encoded text
+"""
+
+
+def get_content_digest(chunks):
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk.encode("utf-8"))
+    return digest.hexdigest()
+
+
+"""
+Get the hash of the content of a file
+
+Parameters:
+    path (str): The path of the file
+
+Returns:
+    digest (str): The SHA-256 hex digest of the file, else `None` if the file does not exist
+"""
+
+
+def get_file_digest(path):
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(BUFFER_SIZE), b""):
+                digest.update(block)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+"""
+Write a file atomically, unless its content would not change
+
+The new file keeps the mode and, where permitted, the owner of the file it replaces.
+
+Parameters:
+    path (str): The path of the file
+    render (callable): Returns an iterable over the chunks of the text, it is called twice
+
+Returns:
+    written (bool): `True` if the file was written, `False` if its content was already up to date
+"""
+
+
+def write_file_atomically(path, render):
+    if get_content_digest(render()) == get_file_digest(path):
+        return False
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", buffering=BUFFER_SIZE) as f:
+            for chunk in render():
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        copy_file_metadata(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    sync_directory(directory)
+    return True
+
+
+"""
+Give a temporary file the mode and owner of the file it replaces, or the default
+mode of new files if there is none
+
+Parameters:
+    path (str): The path of the file that is replaced
+    temp_path (str): The path of the temporary file
+"""
+
+
+def copy_file_metadata(path, temp_path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        os.chmod(temp_path, 0o666 & ~UMASK)
+        return
+    os.chmod(temp_path, stat.st_mode & 0o7777)
+    try:
+        os.chown(temp_path, stat.st_uid, stat.st_gid)
+    except (AttributeError, OSError):
+        pass
+
+
+"""
+Flush the renames in a directory to disk, where the platform allows opening directories
+
+Parameters:
+    directory (str): The path of the directory
+"""
+
+
+def sync_directory(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import sqlite3
+import threading
+
+"""
+Records what was last deployed for every registry service
+
+The store keeps, per backend and registry service id, a canonical hash of the
+payload that was last deployed successfully, along with the `external_id` and
+`client_id` reported for it. An edit whose payload hashes to the recorded value
+does not have to be deployed again. The store is an SQLite file, so it survives
+restarts and can be shared by the deployers of different backends.
+
+"""
+
+
+class FingerprintStore:
+
+    """
+    Class constructor
+
+    Parameters:
+        path (str): The path of the SQLite database, it is created if it does not exist
+        backend (str): The name of the backend the fingerprints are recorded for, e.g. the URL of a realm
+
+    """
+
+    def __init__(self, path, backend):
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        with self.lock:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints ("
+                "backend TEXT NOT NULL, service_id TEXT NOT NULL, digest TEXT NOT NULL, "
+                "external_id TEXT NOT NULL, client_id TEXT NOT NULL, PRIMARY KEY (backend, service_id))"
+            )
+
+    """
+    Get the deployment recorded for a service if its payload is unchanged
+
+    Parameters:
+        service_id (str): The registry id of the service
+        digest (str): The fingerprint of the payload to be deployed
+
+    Returns:
+        deployment (dict): The recorded `external_id` and `client_id`, else `None` if nothing is
+        recorded for the service or the payload changed
+    """
+
+    def match(self, service_id, digest):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT digest, external_id, client_id FROM fingerprints WHERE backend = ? AND service_id = ?",
+                (self.backend, str(service_id)),
+            ).fetchone()
+        if row is None or row[0] != digest:
+            return None
+        return {"external_id": row[1], "client_id": row[2]}
+
+    """
+    Record the payload of a successful deployment
+
+    Parameters:
+        service_id (str): The registry id of the service
+        digest (str): The fingerprint of the deployed payload
+        external_id (str): The id of the service in the backend
+        client_id (str): The client id of the service
+    """
+
+    def put(self, service_id, digest, external_id="", client_id=""):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO fingerprints (backend, service_id, digest, external_id, client_id) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.backend, str(service_id), digest, str(external_id), str(client_id)),
+            )
+
+    """
+    Forget the deployment of a service, e.g. after it was deleted or a deployment failed
+
+    Parameters:
+        service_id (str): The registry id of the service
+    """
+
+    def remove(self, service_id):
+        with self.lock:
+            self.connection.execute(
+                "DELETE FROM fingerprints WHERE backend = ? AND service_id = ?", (self.backend, str(service_id))
+            )
+
+    """
+    Get the deployment recorded for an edit whose payload is unchanged. For any other
+    message the recorded deployment is forgotten, as the service is about to change
+
+    Parameters:
+        service_id (str): The registry id of the service
+        deployment_type (str): The deployment type of the message, "create", "edit" or "delete"
+        digest (str): The fingerprint of the payload to be deployed
+
+    Returns:
+        deployment (dict): The recorded `external_id` and `client_id`, else `None` if the message
+        has to be deployed
+    """
+
+    def check(self, service_id, deployment_type, digest):
+        if deployment_type == "edit":
+            deployment = self.match(service_id, digest)
+            if deployment is not None:
+                return deployment
+        self.remove(service_id)
+        return None
+
+    """
+    Record the outcome of a deployment. Successful creates and edits are recorded,
+    deletes and failed deployments leave nothing recorded
+
+    Parameters:
+        service_id (str): The registry id of the service
+        deployment_type (str): The deployment type of the message, "create", "edit" or "delete"
+        digest (str): The fingerprint of the deployed payload
+        response (dict): The response of the deployment
+        external_id (str): The id of the service in the backend
+        client_id (str): The client id of the service
+    """
+
+    def record(self, service_id, deployment_type, digest, response, external_id="", client_id=""):
+        if deployment_type in ("create", "edit") and response.get("status") in (200, 201):
+            self.put(service_id, digest, external_id, client_id)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+"""
+Get the canonical hash of a payload
+
+Parameters:
+    payload (JSON Object): The payload, keys are sorted so their order does not matter
+
+Returns:
+    digest (str): The SHA-256 hex digest of the canonical JSON form of the payload
+"""
+
+
+def get_fingerprint(payload):
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
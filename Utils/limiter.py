@@ -0,0 +1,147 @@
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+"""
+Limits the number of requests in flight to a backend
+
+The limit adapts with additive increase and multiplicative decrease (AIMD): every
+request that completes in time raises the limit by one request per window, while
+overload signals, i.e. 429 and 503 responses, connection failures and requests
+slower than the latency target, cut it by `backoff_ratio`. A `Retry-After` sent by
+the backend pauses every new request until it has passed.
+
+"""
+
+
+class AdaptiveLimiter:
+
+    """
+    Class constructor
+
+    Parameters:
+        initial_limit (int): The number of requests allowed in flight at start
+        min_limit (int): The lower bound of the limit
+        max_limit (int): The upper bound of the limit
+        latency_target (float): The request latency in seconds above which the limit decreases
+        backoff_ratio (float): The factor the limit is multiplied by on overload
+
+    """
+
+    def __init__(self, initial_limit=4, min_limit=1, max_limit=64, latency_target=5, backoff_ratio=0.5):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.latency_target = latency_target
+        self.backoff_ratio = backoff_ratio
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.paused_until = 0
+        self.last_decrease = 0
+
+    """
+    Wait until a request is allowed to start
+
+    Parameters:
+        timeout (float): The maximum number of seconds to wait, else `None` to wait as long as it takes
+
+    Returns:
+        acquired (bool): `True` if the request may start, `False` if it could not start within the timeout
+    """
+
+    def acquire(self, timeout=None):
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            self.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    pause = self.paused_until - now
+                    if pause <= 0 and self.in_flight < int(self.limit):
+                        break
+                    wait = pause if pause > 0 else None
+                    if give_up_at is not None:
+                        # Give up early if the backend asked to wait past the timeout
+                        if now >= give_up_at or self.paused_until >= give_up_at:
+                            return False
+                        wait = give_up_at - now if wait is None else min(wait, give_up_at - now)
+                    self.condition.wait(wait)
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+            return True
+
+    """
+    Give back a slot that was acquired for a request that was never sent
+    """
+
+    def cancel(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    """
+    Record the outcome of a request and let the next one start
+
+    Parameters:
+        latency (float): The latency of the request in seconds
+        overloaded (bool): Whether the backend signalled overload
+        retry_after (float): The seconds the backend asked to wait, else `None`
+    """
+
+    def release(self, latency, overloaded=False, retry_after=None):
+        with self.condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if retry_after is not None and retry_after > 0:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            if overloaded or latency > self.latency_target:
+                # Decrease at most once per latency window, the requests in flight
+                # when the backend got overloaded all report the same overload
+                if now - self.last_decrease > min(latency, self.latency_target):
+                    self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+                    self.last_decrease = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+    """
+    Get the state of the limiter
+
+    Returns:
+        stats (dict): The current `limit`, the requests `in_flight` and the `queue_depth`,
+        i.e. the requests waiting to start
+    """
+
+    def get_stats(self):
+        with self.condition:
+            return {"limit": int(self.limit), "in_flight": self.in_flight, "queue_depth": self.waiting}
+
+
+"""
+Parse the value of a Retry-After header
+
+Parameters:
+    value (str): The header value, either seconds or an HTTP date
+
+Returns:
+    retry_after (float): The seconds to wait, else `None` if the value is missing or invalid
+"""
+
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
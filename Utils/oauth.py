@@ -1,3 +1,6 @@
+import threading
+import time
+
 from oauthlib.oauth2 import BackendApplicationClient
 from requests_oauthlib import OAuth2Session
 
@@ -6,35 +9,143 @@ from requests_oauthlib import OAuth2Session
 :param refresh_token: The refresh_token to use.
 :param client_id: Client id obtained during registration
 :param client_secret: Client secret obtained during registration
-:return: An access token
+:param provider: The OAuth2Session to reuse, a new one is created if omitted
+:return: The token response
 """
 
 
-def refresh_token_grant(issuer, refresh_token, client_id, client_secret):
+def fetch_refresh_token_grant(issuer, refresh_token, client_id, client_secret, provider=None):
     token_url = issuer + "/token"
 
     extra = {"client_id": client_id, "client_secret": client_secret}
 
     try:
         print("Get access token from " + issuer)
-        provider = OAuth2Session()
+        if provider is None:
+            provider = OAuth2Session()
         response = provider.refresh_token(token_url, refresh_token, **extra)
     except:
         print("Failed to get access token")
         raise SystemExit(1)
-    return response["access_token"]
+    return response
 
 
-def client_credentials_grant(issuer, client_id, client_secret):
+def fetch_client_credentials_grant(issuer, client_id, client_secret, oauth=None):
     token_url = issuer + "/protocol/openid-connect/token"
 
     try:
         print("[client_credentials_grant] Get access token from " + issuer)
-        client = BackendApplicationClient(client_id=client_id)
-        oauth = OAuth2Session(client=client)
+        if oauth is None:
+            client = BackendApplicationClient(client_id=client_id)
+            oauth = OAuth2Session(client=client)
         response = oauth.fetch_token(token_url=token_url, client_id=client_id, client_secret=client_secret)
         print("[client_credentials_grant] Access Token: " + response["access_token"])
     except:
         print("[client_credentials_grant] Failed to get access token")
         raise SystemExit(1)
-    return response["access_token"]
+    return response
+
+
+def refresh_token_grant(issuer, refresh_token, client_id, client_secret):
+    return fetch_refresh_token_grant(issuer, refresh_token, client_id, client_secret)["access_token"]
+
+
+def client_credentials_grant(issuer, client_id, client_secret):
+    return fetch_client_credentials_grant(issuer, client_id, client_secret)["access_token"]
+
+
+"""
+Caches an access token and renews it shortly before it expires
+
+"""
+
+
+class TokenManager:
+
+    """
+    Class constructor
+
+    Parameters:
+        issuer (str): The URI of the Authorization Server
+        client_id (str): Client id obtained during registration
+        client_secret (str): Client secret obtained during registration
+        refresh_token (str): The refresh_token to use, the client credentials grant is used if omitted
+        refresh_margin (int): The number of seconds before the expiration that the token is renewed, at most
+        half the lifetime of the token so that short-lived tokens are not renewed on every request
+        default_lifetime (int): The lifetime in seconds of tokens issued without `expires_in`
+
+    """
+
+    def __init__(self, issuer, client_id, client_secret, refresh_token=None, refresh_margin=30, default_lifetime=60):
+        self.issuer = issuer
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_token = refresh_token
+        self.refresh_margin = refresh_margin
+        self.default_lifetime = default_lifetime
+        self.access_token = None
+        self.renew_at = 0
+        self.lock = threading.Lock()
+        if refresh_token is None:
+            self.session = OAuth2Session(client=BackendApplicationClient(client_id=client_id))
+        else:
+            self.session = OAuth2Session()
+
+    """
+    Get a valid access token
+
+    Returns:
+        access_token (str): The cached access token or a new one if it is about to expire
+    """
+
+    def get_token(self):
+        with self.lock:
+            if self.access_token is None or time.monotonic() >= self.renew_at:
+                self.renew()
+            return self.access_token
+
+    """
+    Drop the cached access token, e.g. after a 401 response
+
+    Parameters:
+        access_token (str): The token that was rejected, it is only dropped if it is still cached,
+        so that concurrent 401 responses renew the token once. Else `None` to drop any token
+    """
+
+    def invalidate(self, access_token=None):
+        with self.lock:
+            if access_token is None or access_token == self.access_token:
+                self.access_token = None
+
+    def renew(self):
+        if self.refresh_token is None:
+            response = fetch_client_credentials_grant(self.issuer, self.client_id, self.client_secret, self.session)
+        else:
+            response = fetch_refresh_token_grant(
+                self.issuer, self.refresh_token, self.client_id, self.client_secret, self.session
+            )
+            # Keep up with refresh token rotation
+            self.refresh_token = response.get("refresh_token", self.refresh_token)
+        self.access_token = response["access_token"]
+        lifetime = int(response.get("expires_in", self.default_lifetime))
+        self.renew_at = time.monotonic() + lifetime - min(self.refresh_margin, lifetime / 2)
+
+
+_token_managers = {}
+_token_managers_lock = threading.Lock()
+
+
+"""
+Get the token manager shared by every agent in the process for the same client
+
+Returns:
+    token_manager (TokenManager): The token manager of the client
+"""
+
+
+def get_token_manager(issuer, client_id, client_secret, refresh_token=None, refresh_margin=30):
+    key = (issuer, client_id, refresh_token is not None)
+    with _token_managers_lock:
+        if key not in _token_managers:
+            _token_managers[key] = TokenManager(issuer, client_id, client_secret, refresh_token, refresh_margin)
+        return _token_managers[key]
@@ -0,0 +1,165 @@
+import random
+import threading
+import time
+
+import requests
+
+"""
+Retries and circuit breaking for the requests to a backend
+
+Idempotent requests that fail with a transient error are retried with jittered
+exponential backoff. The circuit breaker opens after `failure_threshold`
+consecutive failures and every request fails fast with a CircuitOpenError. After
+`reset_timeout` seconds the circuit turns half-open and lets `half_open_requests`
+probes through. A probe that succeeds closes the circuit, a probe that fails
+opens it again.
+
+"""
+
+# Methods that can be sent again without changing the outcome
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+
+
+class RetryPolicy:
+
+    """
+    Class constructor
+
+    Parameters:
+        max_retries (int): The number of times a failed idempotent request is sent again, `0` disables retries
+        backoff (float): The upper bound in seconds of the first backoff
+        max_backoff (float): The upper bound in seconds of any backoff
+
+    """
+
+    def __init__(self, max_retries=3, backoff=0.5, max_backoff=10):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    """
+    Whether a failed request should be sent again
+
+    Parameters:
+        method (str): The request method
+        attempt (int): The number of retries already made
+
+    Returns:
+        retry (bool): `True` if the request is idempotent and retries are left
+    """
+
+    def should_retry(self, method, attempt):
+        return method.upper() in IDEMPOTENT_METHODS and attempt < self.max_retries
+
+    """
+    Get the delay before a retry, using exponential backoff with full jitter
+
+    Parameters:
+        attempt (int): The number of retries already made
+        retry_after (float): The seconds the backend asked to wait, else `None`
+
+    Returns:
+        delay (float): The seconds to wait before the retry
+    """
+
+    def get_delay(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff))
+        return delay
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    pass
+
+
+class CircuitBreaker:
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    """
+    Class constructor
+
+    Parameters:
+        failure_threshold (int): The consecutive failures that open the circuit
+        reset_timeout (float): The seconds the circuit stays open before probing
+        half_open_requests (int): The probes allowed in flight while half-open
+
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, half_open_requests=1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_requests = half_open_requests
+        self.lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.probes = 0
+
+    """
+    Let a request through or fail fast
+
+    Raises:
+        CircuitOpenError: If the circuit is open or enough probes are in flight
+    """
+
+    def before_request(self):
+        with self.lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError("The circuit is open")
+                self.state = self.HALF_OPEN
+                self.probes = 0
+            if self.state == self.HALF_OPEN:
+                if self.probes >= self.half_open_requests:
+                    raise CircuitOpenError("The circuit is half-open")
+                self.probes += 1
+
+    """
+    Record the outcome of a request that was let through
+
+    Parameters:
+        success (bool): Whether the backend handled the request
+    """
+
+    def record(self, success):
+        with self.lock:
+            if success:
+                self.state = self.CLOSED
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    """
+    Forget a request that was let through but never reached the backend, e.g. because
+    its deadline ran out while it waited for the limiter. A half-open probe slot is
+    given back without recording an outcome
+    """
+
+    def cancel(self):
+        with self.lock:
+            if self.state == self.HALF_OPEN and self.probes > 0:
+                self.probes -= 1
+
+    """
+    Get the seconds left until the circuit lets probes through
+
+    Returns:
+        delay (float): The seconds left while the circuit is open, else `0`
+    """
+
+    def get_open_delay(self):
+        with self.lock:
+            if self.state != self.OPEN:
+                return 0
+            return max(0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def get_state(self):
+        with self.lock:
+            return self.state
@@ -0,0 +1,107 @@
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+"""
+Runs a sync of a backend from a background thread, e.g. the SimpleSAMLphp cron
+
+Sync requests are debounced: a sync starts once no request has arrived for
+`debounce` seconds, or `max_delay` seconds after the first pending request. All
+the requests that arrive while a sync is running are covered by a single
+follow-up sync. The items of the requests are handed back with the response of
+the sync that covered them.
+
+"""
+
+
+class SyncScheduler:
+
+    """
+    Class constructor
+
+    Parameters:
+        sync (callable): Runs a sync and returns its response dict
+        on_done (callable): Called with the response of a sync and the items it covered
+        debounce (float): The number of seconds without new requests before a sync starts
+        max_delay (float): The maximum number of seconds a request waits for its sync to start
+
+    """
+
+    def __init__(self, sync, on_done, debounce=5, max_delay=60):
+        self.sync = sync
+        self.on_done = on_done
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.condition = threading.Condition()
+        self.pending = []
+        self.first_request_at = 0
+        self.last_request_at = 0
+        self.closing = False
+        self.thread = threading.Thread(target=self.run, name="sync-scheduler", daemon=True)
+        self.thread.start()
+
+    """
+    Request a sync that covers the given items
+
+    Parameters:
+        items (list): The items covered by the sync, e.g. the messages that changed the backend
+    """
+
+    def request(self, items):
+        with self.condition:
+            now = time.monotonic()
+            if not self.pending:
+                self.first_request_at = now
+            self.last_request_at = now
+            self.pending.extend(items)
+            self.condition.notify_all()
+
+    """
+    Run a final sync for the pending requests and stop the background thread
+
+    Parameters:
+        timeout (float): The number of seconds to wait for the running and the final sync
+    """
+
+    def close(self, timeout=30):
+        if not self.thread.is_alive():
+            return
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        self.thread.join(timeout)
+
+    def run(self):
+        while True:
+            items = self.collect()
+            if items is None:
+                return
+            try:
+                response = self.sync()
+            except Exception as err:
+                log.exception("Unexpected error while syncing")
+                response = {"status": 0, "error": repr(err)}
+            try:
+                self.on_done(response, items)
+            except Exception:
+                log.exception("Unexpected error while handling the sync response")
+
+    # Wait until the pending requests are due and take them, else return
+    # `None` once the scheduler is closed and nothing is pending
+    def collect(self):
+        with self.condition:
+            while True:
+                if self.pending:
+                    due_at = min(self.last_request_at + self.debounce, self.first_request_at + self.max_delay)
+                    remaining = due_at - time.monotonic()
+                    if remaining <= 0 or self.closing:
+                        items = self.pending
+                        self.pending = []
+                        return items
+                    self.condition.wait(remaining)
+                elif self.closing:
+                    return None
+                else:
+                    self.condition.wait()
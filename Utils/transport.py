@@ -0,0 +1,527 @@
+import json
+import logging
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from Utils.deadline import DeadlineExceeded, get_remaining_time, get_request_timeout
+from Utils.limiter import AdaptiveLimiter, parse_retry_after
+from Utils.resilience import CircuitBreaker, RetryPolicy
+
+# Setup logger
+log = logging.getLogger(__name__)
+
+# Response statuses that signal an overloaded backend
+OVERLOAD_STATUSES = (429, 503)
+# Response statuses of transient failures that are worth a retry
+RETRY_STATUSES = (429, 502, 503, 504)
+# Response statuses that count as a failure of the backend for the circuit breaker
+FAILURE_STATUSES = (502, 503, 504)
+
+
+class BackendSession(requests.Session):
+
+    """
+    Class constructor
+
+    A requests session for the admin API of a backend. Requests go through the
+    adaptive limiter, failed idempotent requests are retried and the circuit
+    breaker fails requests fast while the backend is down.
+
+    Parameters:
+        limiter (AdaptiveLimiter): The limiter of the backend, else `None`
+        retry_policy (RetryPolicy): The retry policy of the backend, else `None`
+        circuit_breaker (CircuitBreaker): The circuit breaker of the backend, else `None`
+
+    """
+
+    def __init__(self, limiter=None, retry_policy=None, circuit_breaker=None):
+        super().__init__()
+        self.limiter = limiter
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+
+    def request(self, method, url, *args, **kwargs):
+        attempt = 0
+        while True:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.before_request()
+            response = None
+            error = None
+            try:
+                response = self.send_limited(method, url, *args, **kwargs)
+            except requests.exceptions.RequestException as err:
+                error = err
+            except BaseException:
+                # Raised by the agent, e.g. DeadlineExceeded while waiting for the limiter,
+                # so it says nothing about the health of the backend
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.cancel()
+                raise
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record(response is not None and response.status_code not in FAILURE_STATUSES)
+
+            retry_after = None
+            if response is not None:
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            delay = get_retry_delay(self.retry_policy, method, attempt, retry_after)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+            remaining = get_remaining_time()
+            if remaining is not None and isinstance(kwargs.get("timeout"), tuple):
+                kwargs["timeout"] = tuple(min(timeout, remaining) for timeout in kwargs["timeout"])
+
+    def send_limited(self, method, url, *args, **kwargs):
+        if self.limiter is None:
+            return super().request(method, url, *args, **kwargs)
+        # Wait for the limiter no longer than what is left of the deadline
+        if not self.limiter.acquire(get_remaining_time()):
+            raise DeadlineExceeded("The time budget of the deployment is exhausted")
+        if isinstance(kwargs.get("timeout"), tuple):
+            # The time spent waiting for the limiter is no longer available to the request
+            try:
+                kwargs["timeout"] = get_request_timeout(*kwargs["timeout"])
+            except DeadlineExceeded:
+                self.limiter.cancel()
+                raise
+        start = time.monotonic()
+        response = None
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            return response
+        finally:
+            if response is None:
+                # The backend could not be reached or did not answer in time
+                self.limiter.release(time.monotonic() - start, overloaded=True)
+            else:
+                self.limiter.release(
+                    time.monotonic() - start,
+                    response.status_code in OVERLOAD_STATUSES,
+                    parse_retry_after(response.headers.get("Retry-After")),
+                )
+
+
+"""
+Create a pooled HTTP session
+
+Connections are kept alive and reused across requests to the same host.
+
+Parameters:
+    pool_connections (int): The number of per-host connection pools to cache
+    pool_maxsize (int): The maximum number of connections kept open per host
+    pool_block (bool): Wait for a free connection instead of opening one over `pool_maxsize`
+    limiter (AdaptiveLimiter): Limits the requests in flight, else `None`
+    retry_policy (RetryPolicy): Retries failed idempotent requests, else `None`
+    circuit_breaker (CircuitBreaker): Fails requests fast while the backend is down, else `None`
+
+Returns:
+    session (requests.Session): The pooled session
+"""
+
+
+def create_session(
+    pool_connections=10, pool_maxsize=10, pool_block=False, limiter=None, retry_policy=None, circuit_breaker=None
+):
+    if limiter is None and retry_policy is None and circuit_breaker is None:
+        session = requests.Session()
+    else:
+        session = BackendSession(limiter, retry_policy, circuit_breaker)
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+"""
+Create a pooled HTTP session from a config section
+
+Parameters:
+    config (dict): The `http` config options of a deployer
+
+Returns:
+    session (requests.Session): The pooled session
+"""
+
+
+def create_session_from_config(config):
+    return create_session(
+        config.get("pool_connections", 10),
+        config.get("pool_maxsize", 10),
+        config.get("pool_block", False),
+        *create_backend_policies(config)
+    )
+
+
+"""
+Create the limiter, the retry policy and the circuit breaker of a backend from a config section
+
+Parameters:
+    config (dict): The `http` config options of a deployer
+
+Returns:
+    policies (tuple): The AdaptiveLimiter, the RetryPolicy and the CircuitBreaker, each `None` if disabled
+"""
+
+
+def create_backend_policies(config):
+    limiter = None
+    if config.get("adaptive_limit", True):
+        limiter = AdaptiveLimiter(
+            config.get("initial_limit", 4),
+            config.get("min_limit", 1),
+            config.get("max_limit", config.get("pool_maxsize", 10)),
+            config.get("latency_target", 5),
+        )
+    retry_policy = None
+    if config.get("retries", 3) > 0:
+        retry_policy = RetryPolicy(
+            config.get("retries", 3), config.get("retry_backoff", 0.5), config.get("retry_max_backoff", 10)
+        )
+    circuit_breaker = None
+    if config.get("circuit_failure_threshold", 5) > 0:
+        circuit_breaker = CircuitBreaker(
+            config.get("circuit_failure_threshold", 5), config.get("circuit_reset_timeout", 30)
+        )
+    return limiter, retry_policy, circuit_breaker
+
+
+"""
+Get the delay before a failed request is sent again
+
+Parameters:
+    retry_policy (RetryPolicy): The retry policy of the backend, else `None`
+    method (str): The request method
+    attempt (int): The number of retries already made
+    retry_after (float): The seconds the backend asked to wait, else `None`
+
+Returns:
+    delay (float): The seconds to wait before the retry, else `None` if the request should not be
+    retried or the retry would not finish within the current deadline
+"""
+
+
+def get_retry_delay(retry_policy, method, attempt, retry_after=None):
+    if retry_policy is None or not retry_policy.should_retry(method, attempt):
+        return None
+    delay = retry_policy.get_delay(attempt, retry_after)
+    remaining = get_remaining_time()
+    if remaining is not None and remaining <= delay:
+        return None
+    return delay
+
+
+"""
+Get the state of the adaptive limiter of a session
+
+Parameters:
+    session (requests.Session): The session of a backend, a BackendSession or an AsyncBackendSession
+
+Returns:
+    stats (dict): The current limit, requests in flight and queue depth, else an empty dict
+    if the session is not limited
+"""
+
+
+def get_limiter_stats(session):
+    limiter = getattr(session, "limiter", None)
+    if limiter is None:
+        return {}
+    return limiter.get_stats()
+
+
+"""
+Get the seconds left until the circuit breaker of a session lets requests through
+
+Parameters:
+    session (requests.Session): The session of a backend, a BackendSession or an AsyncBackendSession
+
+Returns:
+    delay (float): The seconds left while the circuit is open, else `0`
+"""
+
+
+def get_open_circuit_delay(session):
+    circuit_breaker = getattr(session, "circuit_breaker", None)
+    if circuit_breaker is None:
+        return 0
+    return circuit_breaker.get_open_delay()
+
+
+class HttpTransport:
+
+    """
+    Class constructor
+
+    Sends the requests of a backend client over a pooled session and normalizes
+    their outcome into the `{"status", "response"}` and `{"status", "error"}` dicts
+    consumed by `create_ams_response`.
+
+    Parameters:
+        session (requests.Session): A pooled session to reuse, a new one is created if omitted
+        connect_timeout (float): The connect timeout of a request in seconds
+        read_timeout (float): The read timeout of a request in seconds
+        hooks (list): Callables invoked after every request with the method, the URL,
+        the status and the elapsed seconds
+        token_manager (TokenManager): Provides the access token of every request, else `None`
+        if the session carries the token. A request rejected with 401 is sent once more with
+        a renewed token
+
+    Requests made within a deadline (see Utils.deadline) never wait longer than what is left of it.
+
+    """
+
+    def __init__(self, session=None, connect_timeout=5, read_timeout=60, hooks=None, token_manager=None):
+        self.session = session if session is not None else create_session()
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.hooks = list(hooks) if hooks is not None else []
+        self.token_manager = token_manager
+
+    """
+    Register a callable to be invoked after every request
+
+    Parameters:
+        hook (callable): Called with the method, the URL, the status and the elapsed seconds
+    """
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    """
+    Send a request and normalize its outcome
+
+    Parameters:
+        method (str): The request method
+        url (str): The request URL
+        headers (dict): Extra request headers, else `None`
+        json (JSON Object): The request body, else `None`
+        params (dict): The query parameters, else `None`
+
+    Returns:
+        response (dict): The `status` and the `response` body, where bodies of DELETE and empty
+        responses are "OK", else the `status` (`0` if no response was received) and the `error`.
+        The `Location` header, if any, is returned as `location`
+
+    Raises:
+        DeadlineExceeded: If the time budget of the current deadline is exhausted
+    """
+
+    def request(self, method, url, headers=None, json=None, params=None):
+        token = self.get_token()
+        result = self.send(method, url, add_token(headers, token), json, params)
+        if result["status"] == 401 and token is not None:
+            result = self.send(method, url, add_token(headers, self.renew_token(url, token)), json, params)
+        return result
+
+    def send(self, method, url, headers, json, params):
+        timeout = get_request_timeout(self.connect_timeout, self.read_timeout)
+        start = time.monotonic()
+        response = None
+        try:
+            response = self.session.request(method, url, headers=headers, json=json, params=params, timeout=timeout)
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as errh:
+            result = get_http_error_result(url, response.status_code, repr(errh), get_response_body(response))
+        except requests.exceptions.RequestException as err:
+            result = get_request_error_result(url, err)
+        else:
+            result = get_response_result(
+                method, response.status_code, get_response_body(response), response.headers.get("Location")
+            )
+        report_request(self.hooks, method, url, result["status"], time.monotonic() - start)
+        return result
+
+    """
+    Send a request and stream its response
+
+    Parameters:
+        method (str): The request method
+        url (str): The request URL
+        params (dict): The query parameters, else `None`
+
+    Returns:
+        response (requests.Response): The response, its body is read while it is iterated
+        and it has to be closed by the caller
+
+    Raises:
+        requests.exceptions.RequestException: If the request failed or the response is an error
+        DeadlineExceeded: If the time budget of the current deadline is exhausted
+    """
+
+    def stream(self, method, url, params=None):
+        token = self.get_token()
+        try:
+            return self.send_stream(method, url, add_token(None, token), params)
+        except requests.exceptions.HTTPError as err:
+            if token is None or err.response is None or err.response.status_code != 401:
+                raise
+        return self.send_stream(method, url, add_token(None, self.renew_token(url, token)), params)
+
+    def send_stream(self, method, url, headers, params):
+        timeout = get_request_timeout(self.connect_timeout, self.read_timeout)
+        start = time.monotonic()
+        status = 0
+        try:
+            response = self.session.request(method, url, headers=headers, params=params, timeout=timeout, stream=True)
+            status = response.status_code
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError:
+                response.close()
+                raise
+        finally:
+            report_request(self.hooks, method, url, status, time.monotonic() - start)
+        return response
+
+    # Get the access token of a request, else None if the session carries the token
+    def get_token(self):
+        if self.token_manager is None:
+            return None
+        return self.token_manager.get_token()
+
+    # Renew an access token that was rejected with 401, e.g. because it expired or was revoked
+    def renew_token(self, url, token):
+        log.warning("The access token was rejected by %s, retry with a renewed token" % url)
+        self.token_manager.invalidate(token)
+        return self.token_manager.get_token()
+
+
+"""
+Add an access token to the headers of a request
+
+Parameters:
+    headers (dict): The request headers, else `None`
+    token (str): The access token, else `None` to leave the headers as they are
+
+Returns:
+    headers (dict): The request headers with the `Authorization` header of the token
+"""
+
+
+def add_token(headers, token):
+    if token is None:
+        return headers
+    return dict(headers or {}, Authorization="Bearer " + token)
+
+
+"""
+Get the body of a response
+
+Parameters:
+    response (requests.Response): The response
+
+Returns:
+    body (JSON Object): The decoded JSON body, the text if it is not JSON, else "OK" if the
+    response is empty
+"""
+
+
+def get_response_body(response):
+    return parse_response_body(response.status_code, response.text)
+
+
+"""
+Decode the body of a response
+
+Parameters:
+    status (int): The status of the response
+    text (str): The body of the response
+
+Returns:
+    body (JSON Object): The decoded JSON body, the text if it is not JSON, else "OK" if the
+    response is empty
+"""
+
+
+def parse_response_body(status, text):
+    if status == 204 or not text:
+        return "OK"
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+"""
+Normalize a successful response
+
+Parameters:
+    method (str): The request method
+    status (int): The status of the response
+    body (JSON Object): The decoded body of the response
+    location (str): The `Location` header of the response, else `None`
+
+Returns:
+    response (dict): The `status` and the `response` body, "OK" for DELETE requests, with the
+    `location`, if any
+"""
+
+
+def get_response_result(method, status, body, location=None):
+    result = {"status": status, "response": "OK" if method == "DELETE" else body}
+    if location is not None:
+        result["location"] = location
+    return result
+
+
+"""
+Normalize and log an HTTP error response
+
+Parameters:
+    url (str): The request URL
+    status (int): The status of the response
+    error (str): The description of the error
+    body (JSON Object): The decoded body of the response
+
+Returns:
+    response (dict): The `status`, the `error` and the `response` body
+"""
+
+
+def get_http_error_result(url, status, error, body):
+    log.error("HTTP Error: %s with error: HTTP %s and response: %s" % (url, status, body))
+    return {"status": status, "error": error, "response": body}
+
+
+"""
+Normalize and log a request that received no response
+
+Parameters:
+    url (str): The request URL
+    err (Exception): The error raised by the HTTP client
+
+Returns:
+    response (dict): The status `0` and the `error`
+"""
+
+
+def get_request_error_result(url, err):
+    log.error("Failed to make request to %s with error: %s" % (url, repr(err)))
+    return {"status": 0, "error": repr(err)}
+
+
+"""
+Log a completed request and report it to the hooks of a transport
+
+Parameters:
+    hooks (list): Callables invoked with the method, the URL, the status and the elapsed seconds
+    method (str): The request method
+    url (str): The request URL
+    status (int): The status of the response, `0` if no response was received
+    elapsed (float): The seconds the request took
+"""
+
+
+def report_request(hooks, method, url, status, elapsed):
+    log.debug("%s %s: HTTP %s in %.3fs" % (method, url, status, elapsed))
+    for hook in hooks:
+        hook(method, url, status, elapsed)
@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 
+import asyncio
 import importlib.machinery
+import json
 import os
+import tempfile
 import types
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from Utils.deadline import DeadlineExceeded, get_remaining_time
 
 
 def get_resource_path(relative_path):
@@ -115,6 +120,8 @@ class TestDeployerKeycloak(unittest.TestCase):
         ]
 
         mock = MagicMock()
+        mock.add_client_scope_by_id = MagicMock(return_value={"status": 204, "response": "OK"})
+        mock.remove_client_scope_by_id = MagicMock(return_value={"status": 204, "response": "OK"})
         mock.create_client = MagicMock(return_value=out_service)
         mock.get_client_by_id = MagicMock(return_value=out_service)
         mock.get_realm_default_client_scopes = MagicMock(return_value=realm_default_client_scopes)
@@ -203,6 +210,8 @@ class TestDeployerKeycloak(unittest.TestCase):
         }
 
         mock = MagicMock()
+        mock.add_client_scope_by_id = MagicMock(return_value={"status": 204, "response": "OK"})
+        mock.remove_client_scope_by_id = MagicMock(return_value={"status": 204, "response": "OK"})
         mock.update_client = MagicMock(return_value=out_service)
         mock.get_realm_default_client_scopes = MagicMock(return_value=realm_default_client_scopes)
         mock.get_client_authz_permissions = MagicMock(return_value=client_authz_permissions)
@@ -210,6 +219,56 @@ class TestDeployerKeycloak(unittest.TestCase):
         func_result = deployer_keycloak_oidc.deploy_to_keycloak(new_service, mock, "config")
         self.assertEqual(func_result, (out_service, "a1a2a3a4-b5b6-c7c8-d9d0-testOidcId", "testOidcId"))
 
+    # Test that failed client scope calls are reported in the response
+    def test_oidc_deploy_to_keycloak_update_scope_error(self):
+        new_service = {
+            "external_id": "a1a2a3a4-b5b6-c7c8-d9d0-testOidcId",
+            "client_id": "testOidcId",
+            "service_name": "testName",
+            "protocol": "oidc",
+            "deployment_type": "edit",
+            "scope": ["email", "phone"],
+        }
+        out_service = {
+            "response": {
+                "clientId": "testOidcId",
+                "id": "a1a2a3a4-b5b6-c7c8-d9d0-testOidcId",
+                "protocol": "openid-connect",
+                "serviceAccountsEnabled": False,
+                "optionalClientScopes": ["email", "profile"],
+            },
+            "status": 200,
+        }
+
+        mock = MagicMock()
+        mock.update_client = MagicMock(return_value=out_service)
+        mock.get_realm_default_client_scopes = MagicMock(return_value=[])
+        mock.get_client_authz_permissions = MagicMock(return_value={"response": {"enabled": False}, "status": 200})
+        mock.sync_realm_client_scopes = MagicMock(
+            return_value={"email": "testScope1", "profile": "testScope2", "phone": "testScope3"}
+        )
+        mock.remove_client_scope_by_id = MagicMock(return_value={"status": 204, "response": "OK"})
+        mock.add_client_scope_by_id = MagicMock(
+            return_value={"status": 500, "error": "HTTPError('500 Server Error')", "response": None}
+        )
+
+        func_result = deployer_keycloak_oidc.deploy_to_keycloak(new_service, mock, {"scope_concurrency": 4})
+        self.assertEqual(
+            func_result,
+            (
+                {
+                    "status": 500,
+                    "error": "Failed to add client scope 'phone': HTTPError('500 Server Error')",
+                    "response": out_service["response"],
+                },
+                "a1a2a3a4-b5b6-c7c8-d9d0-testOidcId",
+                "testOidcId",
+            ),
+        )
+        mock.remove_client_scope_by_id.assert_called_once_with(
+            "a1a2a3a4-b5b6-c7c8-d9d0-testOidcId", "testScope2", "openid-connect"
+        )
+
     # Test update data with error when calling Keycloak
     def test_oidc_process_data_fail(self):
         new_msg = [
@@ -541,6 +600,8 @@ class TestDeployerKeycloak(unittest.TestCase):
         ]
 
         mock = MagicMock()
+        mock.add_client_scope_by_id = MagicMock(return_value={"status": 204, "response": "OK"})
+        mock.remove_client_scope_by_id = MagicMock(return_value={"status": 204, "response": "OK"})
         mock.update_client = MagicMock(return_value=out_service)
         mock.get_realm_default_client_scopes = MagicMock(return_value=realm_default_client_scopes)
 
@@ -626,3 +687,449 @@ class TestDeployerKeycloak(unittest.TestCase):
                 }
             ],
         )
+
+
+deployer_keycloak_async = types.ModuleType(loader.name)
+loader.exec_module(deployer_keycloak_async)
+
+
+class TestDeployerKeycloakAsync(unittest.TestCase):
+    # Test that the client scopes are updated using the asyncio client
+    def test_oidc_deploy_to_keycloak_async_update(self):
+        new_service = {
+            "external_id": "a1a2a3a4-b5b6-c7c8-d9d0-testOidcId",
+            "client_id": "testOidcId",
+            "service_name": "testName",
+            "service_description": "testDescription",
+            "protocol": "oidc",
+            "deployment_type": "edit",
+            "scope": ["email", "custom"],
+        }
+        out_service = {
+            "response": {
+                "clientId": "testOidcId",
+                "id": "a1a2a3a4-b5b6-c7c8-d9d0-testOidcId",
+                "protocol": "openid-connect",
+                "serviceAccountsEnabled": False,
+                "optionalClientScopes": ["email", "profile"],
+            },
+            "status": 200,
+        }
+
+        mock = AsyncMock()
+        mock.add_client_scope_by_id = AsyncMock(return_value={"status": 204, "response": "OK"})
+        mock.remove_client_scope_by_id = AsyncMock(return_value={"status": 204, "response": "OK"})
+        mock.update_client = AsyncMock(return_value=out_service)
+        mock.get_realm_default_client_scopes = AsyncMock(return_value=[])
+        mock.get_client_authz_permissions = AsyncMock(return_value={"response": {"enabled": False}, "status": 200})
+        mock.sync_realm_client_scopes = AsyncMock(
+            side_effect=[
+                {"email": "testScope1", "profile": "testScope2"},
+                {"email": "testScope1", "profile": "testScope2", "custom": "testScope3"},
+            ]
+        )
+
+        func_result = asyncio.run(deployer_keycloak_async.deploy_to_keycloak_async(new_service, mock, "config"))
+        self.assertEqual(func_result, (out_service, "a1a2a3a4-b5b6-c7c8-d9d0-testOidcId", "testOidcId"))
+        mock.create_realm_oidc_client_scopes.assert_awaited_once_with("custom")
+        mock.remove_client_scope_by_id.assert_awaited_once_with(
+            "a1a2a3a4-b5b6-c7c8-d9d0-testOidcId", "testScope2", "openid-connect"
+        )
+        mock.add_client_scope_by_id.assert_awaited_once_with(
+            "a1a2a3a4-b5b6-c7c8-d9d0-testOidcId", "testScope3", "openid-connect"
+        )
+        mock.update_client_authz_permissions.assert_not_awaited()
+
+    # Test that messages are deployed with the asyncio client and returned in order
+    def test_oidc_process_data_async(self):
+        new_msg = [
+            {"id": 12, "client_id": "testOidcId1", "deployment_type": "edit"},
+            {"id": 13, "client_id": "testOidcId2", "deployment_type": "edit"},
+        ]
+
+        async def deploy(msg, keycloak_agent, keycloak_config, service_id=None, fingerprint_store=None):
+            return {"status": 200}, "external-" + msg["client_id"], msg["client_id"]
+
+        deployer_keycloak_async.deploy_to_keycloak_async = deploy
+        keycloak_config = {"auth_server": "https://example.com/auth", "realm": "example", "max_concurrency": 2}
+
+        func_result = asyncio.run(
+            deployer_keycloak_async.process_data_async(new_msg, "token", keycloak_config, AsyncMock())
+        )
+        self.assertEqual([msg["data"]["id"] for msg in func_result], [12, 13])
+        self.assertEqual(func_result[1]["data"]["external_id"], "external-testOidcId2")
+
+    # Test that an asyncio client created for a batch is closed afterwards
+    def test_process_data_async_closes_agent(self):
+        async def deploy(msg, keycloak_agent, keycloak_config, service_id=None, fingerprint_store=None):
+            return {"status": 200}, "external-" + msg["client_id"], msg["client_id"]
+
+        deployer_keycloak_async.deploy_to_keycloak_async = deploy
+        keycloak_config = {"auth_server": "https://example.com/auth", "realm": "example"}
+        with patch.object(deployer_keycloak_async.AsyncKeycloakClientApi, "close", AsyncMock()) as close:
+            func_result = asyncio.run(
+                deployer_keycloak_async.process_data_async(
+                    [{"id": 12, "client_id": "testOidcId1", "deployment_type": "edit"}], "token", keycloak_config
+                )
+            )
+        self.assertEqual(func_result[0]["data"]["status_code"], 200)
+        close.assert_awaited_once()
+
+
+deployer_keycloak_bulk = types.ModuleType(loader.name)
+loader.exec_module(deployer_keycloak_bulk)
+
+
+class TestDeployerKeycloakBulk(unittest.TestCase):
+    # Test that create messages are imported in bulk and the rest are deployed one by one
+    def test_process_data_bulk_create(self):
+        new_msg = [
+            {"id": 12, "client_id": "testOidcId1", "protocol": "oidc", "deployment_type": "create"},
+            {"id": 13, "client_id": "testOidcId2", "protocol": "oidc", "deployment_type": "create"},
+            {"id": 14, "client_id": "testOidcId3", "protocol": "oidc", "deployment_type": "create"},
+            {"id": 15, "client_id": "testOidcId4", "protocol": "oidc", "deployment_type": "delete"},
+        ]
+        partial_import = {
+            "status": 200,
+            "response": {
+                "added": 2,
+                "results": [
+                    {"action": "ADDED", "resourceType": "CLIENT", "resourceName": "testOidcId1", "id": "uuid1"},
+                    {"action": "ADDED", "resourceType": "CLIENT", "resourceName": "testOidcId3", "id": "uuid3"},
+                ],
+            },
+        }
+
+        mock = MagicMock()
+        mock.get_realm_default_client_scopes = MagicMock(return_value=[])
+        mock.sync_realm_client_scopes = MagicMock(return_value={})
+        mock.partial_import_clients = MagicMock(return_value=partial_import)
+        deployer_keycloak_bulk.deploy_to_keycloak = MagicMock(
+            side_effect=[({"status": 201}, "uuid2", "testOidcId2"), ({"status": 204}, "", "testOidcId4")]
+        )
+        keycloak_config = {
+            "auth_server": "https://example.com/auth",
+            "realm": "example",
+            "bulk_create_threshold": 2,
+            "bulk_chunk_size": 2,
+        }
+
+        func_result = deployer_keycloak_bulk.process_data(new_msg, "token", keycloak_config, mock)
+        self.assertEqual(
+            [(msg["data"]["id"], msg["data"]["status_code"], msg["data"].get("external_id")) for msg in func_result],
+            [(12, 201, "uuid1"), (13, 201, "uuid2"), (14, 201, "uuid3"), (15, 204, None)],
+        )
+        self.assertEqual(mock.partial_import_clients.call_count, 2)
+        self.assertEqual(
+            [client["clientId"] for client in mock.partial_import_clients.call_args_list[0].args[0]],
+            ["testOidcId1", "testOidcId2"],
+        )
+        self.assertEqual(
+            deployer_keycloak_bulk.deploy_to_keycloak.call_args_list[0].args[0]["client_id"], "testOidcId2"
+        )
+
+    # Test that the bulk creation is used only for batches with enough create messages
+    def test_get_bulk_create_indices(self):
+        new_msg = [
+            {"id": 12, "client_id": "testOidcId1", "deployment_type": "create"},
+            {"id": 12, "client_id": "testOidcId1", "deployment_type": "edit"},
+            {"id": 13, "client_id": "testOidcId2", "deployment_type": "create"},
+            {"id": 14, "client_id": "testOidcId3", "deployment_type": "create"},
+        ]
+        self.assertEqual(deployer_keycloak_bulk.get_bulk_create_indices(new_msg, 2), [2, 3])
+        self.assertEqual(deployer_keycloak_bulk.get_bulk_create_indices(new_msg, 3), [])
+        self.assertEqual(deployer_keycloak_bulk.get_bulk_create_indices(new_msg, 0), [])
+
+
+deployer_keycloak_reconcile = types.ModuleType(loader.name)
+loader.exec_module(deployer_keycloak_reconcile)
+
+
+class TestDeployerKeycloakReconcile(unittest.TestCase):
+    # Test that only the clients that differ from the registry export are deployed
+    def test_reconcile(self):
+        registry_messages = [
+            {"id": 1, "client_id": "testOidcId1", "protocol": "oidc", "service_name": "name1", "scope": ["email"]},
+            {"id": 2, "client_id": "testOidcId2", "protocol": "oidc", "service_name": "name2", "scope": ["email"]},
+            {"id": 3, "client_id": "testOidcId3", "protocol": "oidc", "service_name": "name3"},
+            {"id": 4, "client_id": "testOidcId4", "protocol": "oidc", "service_name": "name4"},
+            {"id": 4, "client_id": "testOidcId4", "protocol": "oidc", "deployment_type": "delete"},
+            {"id": 5, "client_id": "testOidcId5", "protocol": "unknown"},
+            {
+                "id": 6,
+                "client_id": "testOidcId6",
+                "protocol": "oidc",
+                "service_name": "name6",
+                "scope": ["email", "entitlement?value=urn:example"],
+                "contacts": [
+                    {"email": "b@example.com", "type": "technical"},
+                    {"email": "a@example.com", "type": "support"},
+                ],
+            },
+        ]
+        matching_client = deployer_keycloak_reconcile.format_keycloak_msg(dict(registry_messages[0]), [], {})
+        matching_client["id"] = "uuid1"
+        matching_client["attributes"]["oauth2.token.exchange.grant.enabled"] = "false"
+        matching_client["defaultClientScopes"] = []
+        differing_client = dict(deployer_keycloak_reconcile.format_keycloak_msg(dict(registry_messages[1]), [], {}))
+        differing_client["optionalClientScopes"] = ["email", "profile"]
+        unmanaged_client = {"clientId": "account", "id": "uuid5"}
+        unsupported_client = {"clientId": "testOidcId5", "id": "uuid6"}
+        reordered_client = deployer_keycloak_reconcile.format_keycloak_msg(dict(registry_messages[6]), [], {})
+        reordered_client["attributes"]["contacts"] = "b@example.com,a@example.com"
+        reordered_client["optionalClientScopes"] = ["email"]
+
+        mock = MagicMock()
+        mock.get_realm_default_client_scopes = MagicMock(return_value=[])
+        mock.iter_clients = MagicMock(
+            return_value=iter(
+                [matching_client, differing_client, unmanaged_client, unsupported_client, reordered_client]
+            )
+        )
+        deployer_keycloak_reconcile.deploy_to_keycloak = MagicMock(
+            side_effect=lambda msg, agent, config, service_id=None, fingerprint_store=None: (
+                {"status": 200},
+                "",
+                msg["client_id"],
+            )
+        )
+
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl") as export_file:
+            export_file.write("\n".join(json.dumps(msg) for msg in registry_messages) + "\n")
+            export_file.flush()
+            func_result = list(
+                deployer_keycloak_reconcile.reconcile(export_file.name, mock, {"max_concurrency": 2}, MagicMock())
+            )
+
+        deployed = [call.args[0] for call in deployer_keycloak_reconcile.deploy_to_keycloak.call_args_list]
+        self.assertEqual(
+            [(msg["client_id"], msg["deployment_type"]) for msg in deployed],
+            [("testOidcId2", "edit"), ("testOidcId3", "create")],
+        )
+        self.assertEqual(
+            sorted((msg["data"]["id"], msg["data"]["status_code"]) for msg in func_result), [(2, 200), (3, 200)]
+        )
+
+    # Test that registry messages without a service id are skipped
+    def test_index_registry_export_without_id(self):
+        registry_messages = [
+            {"id": 1, "client_id": "testOidcId1", "protocol": "oidc"},
+            {"client_id": "testOidcId2", "protocol": "oidc"},
+            {"client_id": "testOidcId1", "protocol": "oidc", "deployment_type": "delete"},
+        ]
+        with tempfile.TemporaryFile() as export_file:
+            export_file.write(("\n".join(json.dumps(msg) for msg in registry_messages) + "\n").encode())
+            export_file.seek(0)
+            with self.assertLogs(level="WARNING") as logs:
+                index = deployer_keycloak_reconcile.index_registry_export(export_file)
+            self.assertEqual(list(index), ["testOidcId1"])
+            self.assertEqual(
+                deployer_keycloak_reconcile.read_registry_message(export_file, index["testOidcId1"])["id"], 1
+            )
+        self.assertEqual(len(logs.output), 2)
+
+    # Test that client representations are compared with the desired state
+    def test_client_matches(self):
+        desired = {"attributes": {"use.jwks.url": False}, "optionalClientScopes": ["email", "profile"]}
+        current = {"id": "uuid", "attributes": {"use.jwks.url": "false"}, "optionalClientScopes": ["profile", "email"]}
+        self.assertTrue(deployer_keycloak_reconcile.client_matches(desired, current))
+        current["optionalClientScopes"] = ["email"]
+        self.assertFalse(deployer_keycloak_reconcile.client_matches(desired, current))
+
+
+deployer_keycloak_deadline = types.ModuleType(loader.name)
+loader.exec_module(deployer_keycloak_deadline)
+
+
+class TestDeployerKeycloakDeadline(unittest.TestCase):
+    # Test that a deployment that runs out of time is reported as an error
+    def test_process_message_deadline_exceeded(self):
+        def deploy(msg, keycloak_agent, keycloak_config, service_id=None, fingerprint_store=None):
+            return keycloak_agent.http_request("GET", "https://example.com/auth")
+
+        keycloak_agent = deployer_keycloak_deadline.KeycloakClientApi("https://example.com/auth", "example", "token")
+        keycloak_agent.session.request = MagicMock()
+        deployer_keycloak_deadline.deploy_to_keycloak = deploy
+        keycloak_config = {"deployment_timeout": 0.000001}
+
+        func_result = deployer_keycloak_deadline.process_message(
+            {"id": 12, "client_id": "testOidcId", "deployment_type": "edit"}, keycloak_agent, keycloak_config, ""
+        )
+        self.assertEqual(
+            func_result,
+            {
+                "attributes": {},
+                "data": {
+                    "id": 12,
+                    "status_code": 504,
+                    "state": "error",
+                    "error_description": "The deployment to Keycloak timed out",
+                },
+            },
+        )
+        keycloak_agent.session.request.assert_not_called()
+
+
+deployer_keycloak_fingerprint = types.ModuleType(loader.name)
+loader.exec_module(deployer_keycloak_fingerprint)
+
+
+class TestDeployerKeycloakFingerprint(unittest.TestCase):
+    service_account_config = {
+        "service_account": {"attribute_name": "voPersonID", "candidate": "id", "scope": "example.org"}
+    }
+
+    def get_new_service(self, deployment_type):
+        return {
+            "client_id": "testOidcId",
+            "service_name": "testName",
+            "protocol": "oidc",
+            "scope": ["openid"],
+            "grant_types": ["client_credentials"],
+            "deployment_type": deployment_type,
+        }
+
+    def get_agent(self, client_response, user_response):
+        mock = MagicMock()
+        mock.get_realm_default_client_scopes = MagicMock(return_value=[])
+        mock.sync_realm_client_scopes = MagicMock(return_value={})
+        mock.create_client = MagicMock(return_value=client_response)
+        mock.update_client = MagicMock(return_value=client_response)
+        mock.get_client_authz_permissions = MagicMock(return_value={"response": {"enabled": False}, "status": 200})
+        mock.get_service_account_user = MagicMock(return_value={"response": {"id": "user1"}, "status": 200})
+        mock.add_mapper = MagicMock(return_value={"status": 409, "error": "Conflict"})
+        mock.update_user = MagicMock(return_value=user_response)
+        return mock
+
+    def get_client_response(self, status):
+        return {
+            "response": {
+                "clientId": "testOidcId",
+                "id": "a1a2a3a4-b5b6-c7c8-d9d0-testOidcId",
+                "protocol": "openid-connect",
+                "serviceAccountsEnabled": True,
+                "optionalClientScopes": [],
+            },
+            "status": status,
+        }
+
+    # Test that a created client is recorded once its service account is set up
+    def test_deploy_to_keycloak_records_fingerprint(self):
+        mock = self.get_agent(self.get_client_response(201), {"status": 204, "response": "OK"})
+        fingerprint_store = MagicMock()
+        fingerprint_store.check = MagicMock(return_value=None)
+
+        deployer_keycloak_fingerprint.deploy_to_keycloak(
+            self.get_new_service("create"), mock, self.service_account_config, "12", fingerprint_store
+        )
+        fingerprint_store.record.assert_called_once()
+
+    # Test that an edit is not recorded if the update of its service account failed
+    def test_deploy_to_keycloak_follow_up_failed(self):
+        mock = self.get_agent(self.get_client_response(200), {"status": 500, "error": "Internal Server Error"})
+        fingerprint_store = MagicMock()
+        fingerprint_store.check = MagicMock(return_value=None)
+
+        func_result = deployer_keycloak_fingerprint.deploy_to_keycloak(
+            self.get_new_service("edit"), mock, self.service_account_config, "12", fingerprint_store
+        )
+        self.assertEqual(func_result[0]["status"], 200)
+        fingerprint_store.record.assert_not_called()
+
+    # Test that an edit is not recorded if the update of its service account failed using the asyncio client
+    def test_deploy_to_keycloak_async_follow_up_failed(self):
+        mock = self.get_agent(self.get_client_response(200), {"status": 500, "error": "Internal Server Error"})
+        async_mock = AsyncMock()
+        for name in (
+            "get_realm_default_client_scopes",
+            "sync_realm_client_scopes",
+            "update_client",
+            "get_client_authz_permissions",
+            "get_service_account_user",
+            "add_mapper",
+            "update_user",
+        ):
+            setattr(async_mock, name, AsyncMock(return_value=getattr(mock, name).return_value))
+        fingerprint_store = MagicMock()
+        fingerprint_store.check = MagicMock(return_value=None)
+
+        asyncio.run(
+            deployer_keycloak_fingerprint.deploy_to_keycloak_async(
+                self.get_new_service("edit"), async_mock, self.service_account_config, "12", fingerprint_store
+            )
+        )
+        async_mock.update_user.assert_awaited_once()
+        fingerprint_store.record.assert_not_called()
+
+    # Test that clients created in bulk are recorded unless their follow-up calls failed
+    def test_deploy_to_keycloak_bulk_records_fingerprint(self):
+        registry_messages = []
+        for client_id in ("testOidcId1", "testOidcId2"):
+            registry_message = self.get_new_service("create")
+            registry_message["client_id"] = client_id
+            registry_messages.append(registry_message)
+        mock = self.get_agent(None, None)
+        mock.update_user = MagicMock(
+            side_effect=[{"status": 204, "response": "OK"}, {"status": 500, "error": "Internal Server Error"}]
+        )
+        mock.partial_import_clients = MagicMock(
+            return_value={
+                "status": 200,
+                "response": {
+                    "results": [
+                        {"action": "ADDED", "resourceType": "CLIENT", "resourceName": "testOidcId1", "id": "uuid1"},
+                        {"action": "ADDED", "resourceType": "CLIENT", "resourceName": "testOidcId2", "id": "uuid2"},
+                    ]
+                },
+            }
+        )
+        fingerprint_store = MagicMock()
+
+        func_result = deployer_keycloak_fingerprint.deploy_to_keycloak_bulk(
+            registry_messages, mock, self.service_account_config, ["12", "13"], fingerprint_store
+        )
+        self.assertEqual([result[0]["status"] for result in func_result], [201, 201])
+        self.assertEqual([call.args[0] for call in fingerprint_store.check.call_args_list], ["12", "13"])
+        fingerprint_store.record.assert_called_once()
+        self.assertEqual(fingerprint_store.record.call_args.args[0], "12")
+        self.assertEqual(fingerprint_store.record.call_args.args[4:], ("uuid1", "testOidcId1"))
+
+    # Test that the partial import of a chunk and the follow-up calls of every client run within a deadline
+    def test_deploy_to_keycloak_bulk_deadline(self):
+        registry_messages = []
+        for client_id in ("testOidcId1", "testOidcId2"):
+            registry_message = self.get_new_service("create")
+            registry_message["client_id"] = client_id
+            registry_message["grant_types"] = ["urn:ietf:params:oauth:grant-type:token-exchange"]
+            registry_messages.append(registry_message)
+        remaining_times = []
+
+        def partial_import_clients(clients):
+            remaining_times.append(get_remaining_time())
+            return {
+                "status": 200,
+                "response": {
+                    "results": [
+                        {"action": "ADDED", "resourceType": "CLIENT", "resourceName": "testOidcId1", "id": "uuid1"},
+                        {"action": "ADDED", "resourceType": "CLIENT", "resourceName": "testOidcId2", "id": "uuid2"},
+                    ]
+                },
+            }
+
+        def update_client_authz_permissions(external_id, action):
+            remaining_times.append(get_remaining_time())
+            if external_id == "uuid2":
+                raise DeadlineExceeded("The time budget of the deployment is exhausted")
+            return {"status": 200, "response": "OK"}
+
+        mock = self.get_agent(None, None)
+        mock.partial_import_clients = MagicMock(side_effect=partial_import_clients)
+        mock.update_client_authz_permissions = MagicMock(side_effect=update_client_authz_permissions)
+        keycloak_config = {"bulk_chunk_size": 2, "deployment_timeout": 60}
+
+        func_result = deployer_keycloak_fingerprint.bulk_create(
+            [dict(msg, id=index) for index, msg in enumerate(registry_messages)], mock, keycloak_config, ""
+        )
+        self.assertEqual([msg["data"]["status_code"] for msg in func_result], [201, 504])
+        self.assertEqual(len(remaining_times), 3)
+        self.assertTrue(all(0 < remaining <= 60 for remaining in remaining_times))
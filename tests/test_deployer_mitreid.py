@@ -130,6 +130,80 @@ class TestDeployerMitreid(unittest.TestCase):
         func_result = deployer_mitreid.call_mitreid(new_service, mock)
         self.assertEqual(func_result, (out_service, "12", "testId1"))
 
+    # Test that an edit without external_id is matched to a client by client_id
+    def test_call_mitreid_update_without_external_id(self):
+        new_service = {
+            "client_id": "testId1",
+            "service_name": "testName1",
+            "contacts": [{"name": "name1", "email": "email1", "type": "technical"}],
+            "deployment_type": "edit",
+        }
+        out_service = {"response": {"id": 12, "clientId": "testId1", "clientName": "testName1"}, "status": 200}
+
+        mock = Mock()
+        mock.findClientByClientId = MagicMock(return_value={"id": 12, "clientId": "testId1"})
+        mock.getIndexedClient = MagicMock(return_value=None)
+        mock.updateClientById = MagicMock(return_value=out_service)
+
+        func_result = deployer_mitreid.call_mitreid(new_service, mock)
+        self.assertEqual(func_result, (out_service, "12", "testId1"))
+        mock.updateClientById.assert_called_once_with(
+            "12", {"clientId": "testId1", "clientName": "testName1", "contacts": ["email1"]}
+        )
+
+    # Test that a delete of an unknown client without external_id is reported as not found
+    def test_call_mitreid_delete_unknown_client(self):
+        mock = Mock()
+        mock.findClientByClientId = MagicMock(return_value=None)
+
+        func_result = deployer_mitreid.call_mitreid(
+            {"client_id": "testId1", "contacts": [], "deployment_type": "delete"}, mock
+        )
+        self.assertEqual(func_result, ({"status": 404, "error": "Client not found"}, "", ""))
+        mock.deleteClientById.assert_not_called()
+
+    # Test that an edit of a client that is up to date is not sent to mitreid
+    def test_call_mitreid_update_up_to_date(self):
+        new_service = {
+            "external_id": "12",
+            "client_id": "testId1",
+            "service_name": "testName1",
+            "contacts": [{"name": "name1", "email": "email1", "type": "technical"}],
+            "deployment_type": "edit",
+        }
+        current_client = {"id": 12, "clientId": "testId1", "clientName": "testName1", "contacts": ["email1"]}
+
+        mock = Mock()
+        mock.getIndexedClient = MagicMock(return_value=current_client)
+        mock.getClientById = MagicMock(return_value={"status": 200, "response": current_client})
+
+        func_result = deployer_mitreid.call_mitreid(new_service, mock)
+        self.assertEqual(func_result, ({"status": 200, "response": current_client}, "12", "testId1"))
+        mock.getClientById.assert_called_once_with("12")
+        mock.updateClientById.assert_not_called()
+
+    # Test that an edit is sent to mitreid when the client changed since it was indexed
+    def test_call_mitreid_update_outdated_index(self):
+        new_service = {
+            "external_id": "12",
+            "client_id": "testId1",
+            "service_name": "testName1",
+            "contacts": [{"name": "name1", "email": "email1", "type": "technical"}],
+            "deployment_type": "edit",
+        }
+        indexed_client = {"id": 12, "clientId": "testId1", "clientName": "testName1", "contacts": ["email1"]}
+        current_client = dict(indexed_client, clientName="changedName")
+        updated_client = {"status": 200, "response": indexed_client}
+
+        mock = Mock()
+        mock.getIndexedClient = MagicMock(return_value=indexed_client)
+        mock.getClientById = MagicMock(return_value={"status": 200, "response": current_client})
+        mock.updateClientById = MagicMock(return_value=updated_client)
+
+        func_result = deployer_mitreid.call_mitreid(new_service, mock)
+        self.assertEqual(func_result, (updated_client, "12", "testId1"))
+        mock.updateClientById.assert_called_once()
+
     # Test update data with error when calling mitreid
     def test_update_data_fail(self):
         new_msg = [
@@ -189,3 +263,22 @@ class TestDeployerMitreid(unittest.TestCase):
                 }
             ],
         )
+
+    # Test that an unchanged edit is not sent to mitreid again
+    def test_call_mitreid_unchanged(self):
+        registry_message = {
+            "id": "12",
+            "external_id": "34",
+            "client_id": "testId1",
+            "service_name": "testName1",
+            "contacts": [{"name": "name1", "email": "email1", "type": "technical"}],
+            "deployment_type": "edit",
+        }
+        fingerprint_store = MagicMock()
+        fingerprint_store.check = MagicMock(return_value={"external_id": "34", "client_id": "testId1"})
+        mitreid_agent = MagicMock()
+
+        func_result = deployer_mitreid.call_mitreid(registry_message, mitreid_agent, "12", fingerprint_store)
+        self.assertEqual(func_result, ({"status": 200, "response": "OK"}, "34", "testId1"))
+        mitreid_agent.updateClientById.assert_not_called()
+        fingerprint_store.record.assert_not_called()
@@ -4,12 +4,15 @@ import filecmp
 import importlib.machinery
 import os
 import subprocess
+import tempfile
 import types
 import unittest
-from unittest.mock import MagicMock, Mock
+from unittest.mock import MagicMock, Mock, patch
 
 import requests
 
+from Utils.transport import HttpTransport
+
 
 def get_resource_path(relative_path):
     return os.path.join(os.path.dirname(__file__), relative_path)
@@ -126,36 +129,88 @@ class TestDeployerSsp(unittest.TestCase):
         func_result = deployer_ssp.update_data(func_result, delete_service)
         self.assertEqual(func_result, test_case_result)
 
+    # Test that the indexed state keeps the order of the metadata file
+    def test_apply_messages(self):
+        services = [
+            {"registry_service_id": 1, "whitelist": ["testEntityId1"], "src": "TestMetadataUrl1"},
+            {"registry_service_id": 2, "whitelist": ["testEntityId2"], "src": "TestMetadataUrl2"},
+            {"registry_service_id": 3, "whitelist": ["testEntityId3"], "src": "TestMetadataUrl3"},
+        ]
+        messages = [
+            {"id": 4, "entity_id": "testEntityId4", "metadata_url": "TestMetadataUrl4", "deployment_type": "create"},
+            {"id": 2, "entity_id": "testEntityId5", "metadata_url": "TestMetadataUrl5", "deployment_type": "edit"},
+            {"id": 1, "deployment_type": "delete"},
+            {"id": 3, "entity_id": "testEntityId3", "metadata_url": "TestMetadataUrl3", "deployment_type": "create"},
+        ]
+        changed = set()
+        state = deployer_ssp.apply_messages(deployer_ssp.index_services(services), messages, changed)
+        self.assertEqual(
+            list(deployer_ssp.iter_services(state)),
+            [
+                {"registry_service_id": 2, "whitelist": ["testEntityId5"], "src": "TestMetadataUrl5"},
+                {"registry_service_id": 3, "whitelist": ["testEntityId3"], "src": "TestMetadataUrl3"},
+                {"registry_service_id": 4, "whitelist": ["testEntityId4"], "src": "TestMetadataUrl4"},
+            ],
+        )
+        self.assertEqual(changed, {1, 2, 4})
+
+    # Test that messages matching the deployed state are not reported as changed
+    def test_apply_messages_unchanged(self):
+        services = [{"registry_service_id": 1, "whitelist": ["testEntityId1"], "src": "TestMetadataUrl1"}]
+        messages = [
+            {"id": 1, "entity_id": "testEntityId1", "metadata_url": "TestMetadataUrl1", "deployment_type": "edit"},
+            {"id": 2, "entity_id": "testEntityId2", "metadata_url": "TestMetadataUrl2", "deployment_type": "edit"},
+            {"id": 3, "deployment_type": "delete"},
+        ]
+        changed = set()
+        state = deployer_ssp.apply_messages(deployer_ssp.index_services(services), messages, changed)
+        self.assertEqual(changed, set())
+        self.assertEqual(list(deployer_ssp.iter_services(state)), services)
+
     # Verify the generated php config
     def test_generate_config(self):
         services = [
             {"registry_service_id": "1", "whitelist": ["testEntityId1"], "src": "TestMetadataUrl1"},
             {"registry_service_id": "2", "whitelist": ["testEntityId2"], "src": "TestMetadataUrl2"},
         ]
-        deployer_ssp.generate_config(services, "./test_file.php")
-        self.assertTrue(filecmp.cmp("./test_file.php", get_resource_path("./files/ssp_config.php")), "Files differ")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "test_file.php")
+            deployer_ssp.generate_config(services, path)
+            self.assertTrue(filecmp.cmp(path, get_resource_path("./files/ssp_config.php")), "Files differ")
 
     # Call ssp syncer with 200 http response
     def test_call_ssp_syncer_positive(self):
         mock = Mock()
         mock.status_code = 200
-        mock.return_value.raise_for_status = None
-        mock.json = MagicMock(return_value="")
-        mock_req = requests
-        mock_req.get = MagicMock(return_value=mock)
-        func_result = deployer_ssp.call_ssp_syncer("test_url", "key", 60, "hourly")
-        self.assertEqual(func_result["status"], 200)
+        mock.text = ""
+        mock.headers = {}
+        transport = HttpTransport(MagicMock())
+        transport.session.request = MagicMock(return_value=mock)
+        func_result = deployer_ssp.call_ssp_syncer("test_url", "key", 60, "hourly", transport)
+        self.assertEqual(func_result, {"status": 200, "response": "OK"})
+        transport.session.request.assert_called_once_with(
+            "GET", "test_url", headers=None, json=None, params={"key": "key", "tag": "hourly"}, timeout=(5, 60)
+        )
 
     # Call ssp syncer with 400 http response
     def test_call_ssp_syncer_negative(self):
         mock = Mock()
         mock.status_code = 400
-        mock.return_value.raise_for_status = Exception("ERROR")
-        mock.json = MagicMock(return_value="ERROR")
-        mock_req = requests
-        mock_req.get = MagicMock(return_value=mock)
-        func_result = deployer_ssp.call_ssp_syncer("test_url", "key", 60, "hourly")
+        mock.text = "ERROR"
+        mock.raise_for_status = MagicMock(side_effect=requests.exceptions.HTTPError("ERROR"))
+        mock.json = MagicMock(side_effect=ValueError)
+        transport = HttpTransport(MagicMock())
+        transport.session.request = MagicMock(return_value=mock)
+        func_result = deployer_ssp.call_ssp_syncer("test_url", "key", 60, "hourly", transport)
         self.assertEqual(func_result["status"], 400)
+        self.assertEqual(func_result["response"], "ERROR")
+
+    # Call ssp syncer when the connection fails
+    def test_call_ssp_syncer_connection_error(self):
+        transport = HttpTransport(MagicMock())
+        transport.session.request = MagicMock(side_effect=requests.exceptions.ConnectionError("ERROR"))
+        func_result = deployer_ssp.call_ssp_syncer("test_url", "key", 60, "hourly", transport)
+        self.assertEqual(func_result["status"], 0)
 
     # Test reading from php configuration file
     def test_get_services_from_conf(self):
@@ -173,3 +228,83 @@ class TestDeployerSsp(unittest.TestCase):
         mock_sub.run = MagicMock(return_value=ret)
         with self.assertRaises(SystemExit):
             deployer_ssp.get_services_from_conf("")
+
+    # Test reading the configuration file written by generate_config without php
+    def test_get_services_from_conf_native(self):
+        mock_sub = subprocess
+        mock_sub.run = MagicMock()
+        self.assertEqual(
+            deployer_ssp.get_services_from_conf(get_resource_path("./files/ssp_config.php")),
+            [
+                {"registry_service_id": 1, "whitelist": ["testEntityId1"], "src": "TestMetadataUrl1"},
+                {"registry_service_id": 2, "whitelist": ["testEntityId2"], "src": "TestMetadataUrl2"},
+            ],
+        )
+        mock_sub.run.assert_not_called()
+
+    # Test parsing the escape sequences of php strings and rejecting other formats
+    def test_iter_metadata_config(self):
+        lines = ["<?php", "", "return [", "    [", "        'src' => 'it\\'s \\\\ \\n',", "    ],", "];"]
+        self.assertEqual(list(deployer_ssp.iter_metadata_config(lines)), [{"src": "it's \\ \\n"}])
+        for lines in (["<?php", "$config = [];"], ["<?php", "return [", "    ["], ["<?php", "return [", "];", "?>"]):
+            with self.assertRaises(ValueError):
+                list(deployer_ssp.iter_metadata_config(lines))
+
+    # Test that the sharded metadata is read back and only the changed shards are written
+    def test_generate_shards(self):
+        services = [
+            {"registry_service_id": 1, "whitelist": ["testEntityId1"], "src": "TestMetadataUrl1"},
+            {"registry_service_id": 2, "whitelist": ["testEntityId2"], "src": "TestMetadata'Url2"},
+        ]
+        mock_sub = subprocess
+        mock_sub.run = MagicMock()
+        with tempfile.TemporaryDirectory() as directory:
+            shard_dir = os.path.join(directory, "shards")
+            index_path = os.path.join(directory, "metadata.php")
+            state = deployer_ssp.index_services(services)
+            deployer_ssp.generate_shards(state, list(state), shard_dir, index_path)
+            self.assertEqual(deployer_ssp.get_services_from_conf(index_path), services)
+            self.assertEqual(sorted(os.listdir(shard_dir)), ["1.php", "2.php"])
+
+            index_inode = os.stat(index_path).st_ino
+            shard_inode = os.stat(os.path.join(shard_dir, "1.php")).st_ino
+            changed = set()
+            deployer_ssp.apply_messages(
+                state,
+                [
+                    {
+                        "id": 2,
+                        "entity_id": "testEntityId3",
+                        "metadata_url": "TestMetadataUrl3",
+                        "deployment_type": "edit",
+                    }
+                ],
+                changed,
+            )
+            deployer_ssp.generate_shards(state, changed, shard_dir, index_path)
+            self.assertEqual(os.stat(index_path).st_ino, index_inode)
+            self.assertEqual(os.stat(os.path.join(shard_dir, "1.php")).st_ino, shard_inode)
+            self.assertEqual(
+                deployer_ssp.get_services_from_conf(index_path)[1],
+                {"registry_service_id": 2, "whitelist": ["testEntityId3"], "src": "TestMetadataUrl3"},
+            )
+
+            changed = set()
+            deployer_ssp.apply_messages(state, [{"id": 1, "deployment_type": "delete"}], changed)
+            remove = os.remove
+            included = []
+
+            # Record whether the index still includes a shard when it is removed
+            def remove_shard(shard_path):
+                with open(index_path) as f:
+                    included.append(os.path.basename(shard_path) in f.read())
+                remove(shard_path)
+
+            with patch("os.remove", side_effect=remove_shard):
+                deployer_ssp.generate_shards(state, changed, shard_dir, index_path)
+            self.assertEqual(included, [False])
+            self.assertEqual(os.listdir(shard_dir), ["2.php"])
+            self.assertEqual(
+                [service["registry_service_id"] for service in deployer_ssp.get_services_from_conf(index_path)], [2]
+            )
+        mock_sub.run.assert_not_called()
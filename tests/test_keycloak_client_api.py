@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import unittest
+from unittest.mock import MagicMock
+
+from Keycloak.KeycloakClientApi import KeycloakClientApi
+from Utils.transport import create_session_from_config
+
+realm_default_client_scopes = [
+    {"id": "a1a2a3a4-b5b6-c7c8-d9d0-testScope1", "name": "profile", "protocol": "openid-connect"},
+    {"id": "a1a2a3a4-b5b6-c7c8-d9d0-testScope2", "name": "role_list", "protocol": "saml"},
+]
+
+realm_client_scopes = [
+    {"id": "a1a2a3a4-b5b6-c7c8-d9d0-testScope1", "name": "profile", "protocol": "openid-connect"},
+    {"id": "a1a2a3a4-b5b6-c7c8-d9d0-testScope3", "name": "email", "protocol": "openid-connect"},
+]
+
+
+class TestKeycloakClientApi(unittest.TestCase):
+    # Test that the realm default client scopes are fetched once for every protocol
+    def test_realm_default_client_scopes_cache(self):
+        keycloak_agent = KeycloakClientApi("https://example.com/auth", "example", "token")
+        keycloak_agent.http_request = MagicMock(return_value={"status": 200, "response": realm_default_client_scopes})
+        self.assertEqual(
+            keycloak_agent.get_realm_default_client_scopes("openid-connect"), realm_default_client_scopes[:1]
+        )
+        self.assertEqual(keycloak_agent.get_realm_default_client_scopes("saml"), realm_default_client_scopes[1:])
+        self.assertEqual(
+            keycloak_agent.get_realm_default_client_scopes("openid-connect"), realm_default_client_scopes[:1]
+        )
+        self.assertEqual(keycloak_agent.http_request.call_count, 1)
+
+    # Test that created client scopes are added to the cached realm client scopes
+    def test_realm_client_scopes_cache(self):
+        keycloak_agent = KeycloakClientApi("https://example.com/auth", "example", "token")
+        keycloak_agent.http_request = MagicMock(
+            side_effect=[
+                {"status": 200, "response": realm_client_scopes},
+                {
+                    "status": 201,
+                    "response": "OK",
+                    "location": "https://example.com/auth/admin/realms/example/client-scopes/testScope4",
+                },
+            ]
+        )
+        keycloak_agent.sync_realm_client_scopes()
+        keycloak_agent.create_realm_oidc_client_scopes("custom")
+        self.assertEqual(
+            keycloak_agent.sync_realm_client_scopes(),
+            {
+                "profile": "a1a2a3a4-b5b6-c7c8-d9d0-testScope1",
+                "email": "a1a2a3a4-b5b6-c7c8-d9d0-testScope3",
+                "custom": "testScope4",
+            },
+        )
+        self.assertEqual(keycloak_agent.http_request.call_count, 2)
+
+    # Test that the realm cache can be invalidated
+    def test_realm_cache_invalidate(self):
+        keycloak_agent = KeycloakClientApi("https://example.com/auth", "example", "token")
+        keycloak_agent.http_request = MagicMock(return_value={"status": 200, "response": realm_client_scopes})
+        keycloak_agent.sync_realm_client_scopes()
+        keycloak_agent.invalidate_realm_cache()
+        keycloak_agent.sync_realm_client_scopes()
+        self.assertEqual(keycloak_agent.http_request.call_count, 2)
+
+    # Test that a new token is set on the session the agent keeps for its lifetime
+    def test_set_token_shared_session(self):
+        session = create_session_from_config({})
+        keycloak_agent = KeycloakClientApi("https://example.com/auth", "example", "token1", session)
+        other_agent = KeycloakClientApi("https://example.com/auth", "example", "token1", session)
+        self.assertIs(keycloak_agent.session, session)
+        keycloak_agent.set_token("token2")
+        keycloak_agent.set_token("token3")
+        self.assertIs(keycloak_agent.session, session)
+        self.assertIs(keycloak_agent.transport.session, session)
+        self.assertIs(other_agent.session, session)
+        self.assertEqual(session.headers["Authorization"], "Bearer token3")
+        response = MagicMock(status_code=200, text="", headers={})
+        session.request = MagicMock(return_value=response)
+        keycloak_agent.http_request("GET", "https://example.com/auth/admin/realms/example/clients")
+        other_agent.http_request("GET", "https://example.com/auth/admin/realms/example/clients")
+        self.assertEqual(session.request.call_count, 2)
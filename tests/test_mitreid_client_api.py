@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import json
+import unittest
+from unittest.mock import MagicMock
+
+from MitreidConnect.MitreidClientApi import iter_json_array, mitreidClientApi
+
+clients = [
+    {"id": 1, "clientId": "testId1", "clientName": "testName1", "redirectUris": ["https://a", "https://b"]},
+    {"id": 2, "clientId": "testId2", "clientName": 'testName2 ]"[', "redirectUris": []},
+]
+
+
+def get_stream_response(chunk_size):
+    data = json.dumps(clients).encode()
+    response = MagicMock(status_code=200)
+    response.iter_content = MagicMock(
+        return_value=[data[index : index + chunk_size] for index in range(0, len(data), chunk_size)]
+    )
+    return response
+
+
+class TestMitreidClientApi(unittest.TestCase):
+    # Test that the items of a JSON array are decoded whatever the chunk boundaries
+    def test_iter_json_array(self):
+        data = json.dumps(clients + [12, "é", None]).encode()
+        for chunk_size in (1, 2, 7, len(data)):
+            chunks = [data[index : index + chunk_size] for index in range(0, len(data), chunk_size)]
+            self.assertEqual(list(iter_json_array(chunks)), clients + [12, "é", None])
+        self.assertEqual(list(iter_json_array([b" [ ] "])), [])
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'{"id": 1}']))
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'[{"id": 1}']))
+
+    # Test that the client index is loaded once and looked up by id and client id
+    def test_client_index(self):
+        mitreid_agent = mitreidClientApi("https://example.com", "token")
+        mitreid_agent.session.request = MagicMock(return_value=get_stream_response(5))
+        self.assertEqual(mitreid_agent.findClientByClientId("testId2"), clients[1])
+        self.assertEqual(mitreid_agent.getIndexedClient("1"), clients[0])
+        self.assertIsNone(mitreid_agent.findClientByClientId("testId3"))
+        self.assertEqual(mitreid_agent.session.request.call_count, 1)
+
+    # Test that the client index is updated with the clients created, updated and deleted
+    def test_client_index_write_through(self):
+        mitreid_agent = mitreidClientApi("https://example.com", "token")
+        mitreid_agent.session.request = MagicMock(return_value=get_stream_response(64))
+        mitreid_agent.loadClientIndex()
+        mitreid_agent.transport.request = MagicMock(
+            side_effect=[
+                {"status": 200, "response": {"id": 3, "clientId": "testId3"}},
+                {"status": 200, "response": {"id": 1, "clientId": "testId4"}},
+                {"status": 204, "response": "OK"},
+            ]
+        )
+        mitreid_agent.createClient({"clientId": "testId3"})
+        mitreid_agent.updateClientById(1, {"clientId": "testId4"})
+        mitreid_agent.deleteClientById(2)
+        self.assertEqual(mitreid_agent.findClientByClientId("testId3"), {"id": 3, "clientId": "testId3"})
+        self.assertEqual(mitreid_agent.findClientByClientId("testId4"), {"id": 1, "clientId": "testId4"})
+        self.assertIsNone(mitreid_agent.findClientByClientId("testId1"))
+        self.assertIsNone(mitreid_agent.getIndexedClient(2))
+        self.assertEqual(mitreid_agent.session.request.call_count, 1)
+
+    # Test that the client index is not used when it is disabled
+    def test_client_index_disabled(self):
+        mitreid_agent = mitreidClientApi("https://example.com", "token", client_index_ttl=0)
+        mitreid_agent.session.request = MagicMock(return_value=get_stream_response(64))
+        self.assertIsNone(mitreid_agent.getIndexedClient(1))
+        mitreid_agent.session.request.assert_not_called()
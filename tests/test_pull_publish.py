@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+import json
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from argo_ams_library import AmsServiceException
+
+from ServiceRegistryAms.BackgroundPublisher import BackgroundPublisher
+from ServiceRegistryAms.BatchSizeController import BatchSizeController
+from ServiceRegistryAms.PollScheduler import PollScheduler
+from ServiceRegistryAms.PullPublish import PullPublish
+
+ams_config = {
+    "host": "example.host.com",
+    "project": "ams-project",
+    "pull_topic": "ams-topic",
+    "pull_sub": "ams-sub",
+    "token": "ams-token",
+    "pub_topic": "ams-publish-topic",
+    "poll_interval": 1,
+    "max_batch_size": 8,
+}
+
+
+def ams_messages(count):
+    messages = []
+    for i in range(count):
+        msg = MagicMock()
+        msg.get_data = MagicMock(return_value=json.dumps({"id": i}).encode("utf-8"))
+        messages.append(("ackId" + str(i), msg))
+    return messages
+
+
+class TestBatchSizeController(unittest.TestCase):
+    # Test that the batch grows while the subscription has backlog
+    def test_grow_with_backlog(self):
+        controller = BatchSizeController(max_batch_size=8, target_batch_latency=10)
+        sizes = []
+        for _ in range(5):
+            controller.record_pull(controller.batch_size, controller.batch_size)
+            sizes.append(controller.record_latency(1))
+        self.assertEqual(sizes, [2, 4, 8, 8, 8])
+
+    # Test that the batch does not grow when the subscription is drained
+    def test_no_growth_without_backlog(self):
+        controller = BatchSizeController(max_batch_size=8, target_batch_latency=10)
+        controller.record_pull(1, 0)
+        self.assertEqual(controller.record_latency(1), 1)
+
+    # Test that the batch shrinks when the deploy latency climbs
+    def test_shrink_on_latency(self):
+        controller = BatchSizeController(max_batch_size=8, target_batch_latency=10)
+        controller.batch_size = 8
+        controller.record_pull(8, 8)
+        self.assertEqual(controller.record_latency(20), 4)
+        self.assertEqual(controller.record_latency(20), 2)
+        self.assertEqual(controller.record_latency(20), 1)
+        self.assertEqual(controller.record_latency(20), 1)
+
+
+class TestPollScheduler(unittest.TestCase):
+    # Test that a full batch is followed by an immediate poll
+    def test_full_batch(self):
+        scheduler = PollScheduler(poll_interval=1, max_poll_interval=30, jitter=0)
+        self.assertEqual(scheduler.next_delay(10, True), 0)
+
+    # Test that a partial batch is followed by the configured poll interval
+    def test_partial_batch(self):
+        scheduler = PollScheduler(poll_interval=1, max_poll_interval=30, jitter=0)
+        self.assertEqual(scheduler.next_delay(3, False), 1)
+
+    # Test the exponential backoff of consecutive empty polls
+    def test_empty_backoff(self):
+        scheduler = PollScheduler(poll_interval=1, max_poll_interval=30, jitter=0)
+        delays = [scheduler.next_delay(0, False) for _ in range(7)]
+        self.assertEqual(delays, [1, 2, 4, 8, 16, 30, 30])
+        self.assertEqual(scheduler.next_delay(1, False), 1)
+        self.assertEqual(scheduler.next_delay(0, False), 1)
+
+    # Test that the jitter never exceeds the cap
+    def test_empty_backoff_jitter(self):
+        scheduler = PollScheduler(poll_interval=1, max_poll_interval=30, jitter=0.5)
+        for _ in range(20):
+            delay = scheduler.next_delay(0, False)
+            self.assertTrue(0 <= delay <= 30)
+
+
+class TestBackgroundPublisher(unittest.TestCase):
+    # Test that queued messages are coalesced into size bounded chunks
+    def test_publish_chunks(self):
+        ams = MagicMock()
+        ams.publish = MagicMock(return_value=True)
+        publisher = BackgroundPublisher(ams, {"publish_batch_size": 2, "publish_flush_interval": 0.1})
+        publisher.publish([{"attributes": {}, "data": {"id": i}} for i in range(5)])
+        publisher.close()
+        chunks = [call.args[0] for call in ams.publish.call_args_list]
+        self.assertEqual(sum(len(chunk) for chunk in chunks), 5)
+        self.assertTrue(all(len(chunk) <= 2 for chunk in chunks))
+
+    # Test that a failed flush is retried
+    def test_publish_retry(self):
+        ams = MagicMock()
+        ams.publish = MagicMock(side_effect=[False, True])
+        publisher = BackgroundPublisher(
+            ams, {"publish_flush_interval": 0.01, "publish_retry_interval": 0.01, "publish_batch_size": 10}
+        )
+        publisher.publish([{"attributes": {}, "data": {"id": 1}}])
+        for _ in range(100):
+            if ams.publish.call_count == 2:
+                break
+            time.sleep(0.01)
+        publisher.close()
+        self.assertEqual(ams.publish.call_count, 2)
+        self.assertEqual(ams.publish.call_args_list[1].args[0], [{"attributes": {}, "data": {"id": 1}}])
+
+    # Test that chunks failing every attempt are dropped so that publishing never blocks
+    def test_publish_permanent_failure(self):
+        ams = MagicMock()
+        ams.publish = MagicMock(return_value=False)
+        publisher = BackgroundPublisher(
+            ams,
+            {
+                "publish_queue_size": 1,
+                "publish_batch_size": 1,
+                "publish_flush_interval": 0.01,
+                "publish_retry_interval": 0.01,
+                "publish_max_attempts": 2,
+            },
+        )
+        with self.assertLogs("ServiceRegistryAms.BackgroundPublisher", level="ERROR") as logs:
+            thread = threading.Thread(
+                target=publisher.publish, args=([{"attributes": {}, "data": {"id": i}} for i in range(5)],)
+            )
+            thread.start()
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+            publisher.close()
+        self.assertEqual(len(logs.output), 5)
+        self.assertIn("after 2 attempts", logs.output[0])
+
+
+class TestPullPublish(unittest.TestCase):
+    # Test that pull uses the adaptive batch size
+    def test_pull_adaptive_batch_size(self):
+        ams = PullPublish(ams_config)
+        ams.ams = MagicMock()
+        ams.ams.pull_sub = MagicMock(return_value=ams_messages(1))
+        messages, ackids = ams.pull()
+        ams.ams.pull_sub.assert_called_with("ams-sub", 1)
+        self.assertEqual(messages, [{"id": 0}])
+        self.assertEqual(ackids, ["ackId0"])
+
+        ams.record_latency(1)
+        ams.ams.pull_sub = MagicMock(return_value=ams_messages(2))
+        ams.pull()
+        ams.ams.pull_sub.assert_called_with("ams-sub", 2)
+
+    # Test that the subscription and topic are checked once and then served from the cache
+    def test_metadata_cache(self):
+        ams = PullPublish(ams_config)
+        ams.ams = MagicMock()
+        ams.ams.pull_sub = MagicMock(return_value=[])
+        for _ in range(3):
+            ams.pull()
+            ams.publish([{"attributes": {}, "data": {"id": 1}}])
+        self.assertEqual(ams.ams.has_sub.call_count, 1)
+        self.assertEqual(ams.ams.has_topic.call_count, 1)
+        self.assertEqual(ams.metadata_stats()["saved_round_trips"], 4)
+
+    # Test that a not found error from AMS invalidates the cached subscription
+    def test_metadata_cache_invalidation(self):
+        ams = PullPublish(ams_config)
+        ams.ams = MagicMock()
+        ams.ams.has_sub = MagicMock(return_value=False)
+        not_found = AmsServiceException(
+            json={"error": {"code": 404, "message": "Subscription not found"}}, request="sub_pull"
+        )
+        ams.ams.pull_sub = MagicMock(side_effect=[[], not_found, ams_messages(1)])
+        ams.pull()
+        messages, ackids = ams.pull()
+        self.assertEqual(messages, [{"id": 0}])
+        self.assertEqual(ams.ams.create_sub.call_count, 2)
+        self.assertEqual(ams.metadata_stats()["invalidations"], 1)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import copy
+import unittest
+
+from Keycloak import KeycloakTranslator
+from MitreidConnect import MitreidTranslator
+
+
+class TestKeycloakTranslator(unittest.TestCase):
+    # Test that a batch is translated per protocol and the messages are left unchanged
+    def test_translate_many(self):
+        messages = [
+            {"client_id": "testOidcId", "protocol": "oidc", "scope": ["openid", "email"], "grant_types": ["implicit"]},
+            {"entity_id": "https://sp.example.org", "protocol": "saml", "requested_attributes": []},
+        ]
+        original_messages = copy.deepcopy(messages)
+
+        func_result = KeycloakTranslator.translate_many(
+            messages, {"openid-connect": ["profile"], "saml": ["role_list"]}, {}
+        )
+        self.assertEqual(messages, original_messages)
+        self.assertEqual(func_result[0]["clientId"], "testOidcId")
+        self.assertEqual(func_result[0]["optionalClientScopes"], ["email"])
+        self.assertEqual(func_result[0]["defaultClientScopes"], ["profile"])
+        self.assertTrue(func_result[0]["implicitFlowEnabled"])
+        self.assertEqual(func_result[1]["clientId"], "https://sp.example.org")
+        self.assertEqual(func_result[1]["defaultClientScopes"], ["role_list"])
+
+    # Test that the templates are not shared between translated messages
+    def test_translate_copies_template(self):
+        first = KeycloakTranslator.translate({"protocol": "oidc", "grant_types": ["client_credentials"]}, [], {})
+        second = KeycloakTranslator.translate({"protocol": "oidc"}, [], {})
+        first["attributes"]["use.jwks.url"] = "true"
+        self.assertFalse(second["serviceAccountsEnabled"])
+        self.assertEqual(KeycloakTranslator.OIDC_TEMPLATE["attributes"]["use.jwks.url"], "false")
+
+
+class TestMitreidTranslator(unittest.TestCase):
+    # Test that registry fields are renamed and converted
+    def test_translate(self):
+        message = {
+            "client_id": "testId1",
+            "external_id": "12",
+            "service_name": "testName1",
+            "website_url": "https://example.org",
+            "token_endpoint_auth_method": "private_key_jwt",
+            "created_at": "2021-05-04T10:11:12.000Z",
+            "contacts": [{"email": "email1", "type": "support"}],
+        }
+
+        self.assertEqual(
+            MitreidTranslator.translate_many([message], "edit"),
+            [
+                {
+                    "clientId": "testId1",
+                    "clientName": "testName1",
+                    "clientUri": "https://example.org",
+                    "tokenEndpointAuthMethod": "PRIVATE_KEY",
+                    "createdAt": "2021-05-04T10:11:12+0000",
+                    "contacts": ["email1"],
+                }
+            ],
+        )
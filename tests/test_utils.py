@@ -0,0 +1,591 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import aiohttp
+import requests
+
+from Utils.async_transport import AsyncBackendSession, AsyncHttpTransport, AsyncResponse
+from Utils.coalesce import coalesce_messages, expand_pub_messages
+from Utils.common import get_deployment_keys
+from Utils.concurrency import group_by_keys, map_concurrently, run_in_order
+from Utils.deadline import DeadlineExceeded, deadline_scope, get_request_timeout
+from Utils.files import UMASK, get_file_digest, write_file_atomically
+from Utils.fingerprint import FingerprintStore, get_fingerprint
+from Utils.limiter import AdaptiveLimiter, parse_retry_after
+from Utils.oauth import TokenManager, get_token_manager
+from Utils.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
+from Utils.sync_scheduler import SyncScheduler
+from Utils.transport import BackendSession, HttpTransport, create_session_from_config, get_open_circuit_delay
+
+
+class TestTokenManager(unittest.TestCase):
+    # Test that the access token is fetched once per token lifetime
+    def test_get_token_cached(self):
+        token_manager = TokenManager("https://example.com/auth/realms/example", "client", "secret")
+        token_manager.session.fetch_token = MagicMock(return_value={"access_token": "token1", "expires_in": 300})
+        self.assertEqual(token_manager.get_token(), "token1")
+        self.assertEqual(token_manager.get_token(), "token1")
+        self.assertEqual(token_manager.session.fetch_token.call_count, 1)
+
+    # Test that the access token is renewed shortly before it expires
+    def test_get_token_expiring(self):
+        token_manager = TokenManager("https://example.com/oidc", "client", "secret", "refresh", refresh_margin=30)
+        token_manager.session.refresh_token = MagicMock(
+            side_effect=[
+                {"access_token": "token1", "expires_in": 300, "refresh_token": "refresh2"},
+                {"access_token": "token2", "expires_in": 300},
+            ]
+        )
+        with patch("Utils.oauth.time.monotonic", return_value=1000):
+            self.assertEqual(token_manager.get_token(), "token1")
+        with patch("Utils.oauth.time.monotonic", return_value=1269):
+            self.assertEqual(token_manager.get_token(), "token1")
+        with patch("Utils.oauth.time.monotonic", return_value=1270):
+            self.assertEqual(token_manager.get_token(), "token2")
+        self.assertEqual(token_manager.session.refresh_token.call_args.args[1], "refresh2")
+
+    # Test that a token living shorter than the refresh margin is renewed halfway through its lifetime
+    def test_get_token_short_lived(self):
+        token_manager = TokenManager("https://example.com/auth/realms/example", "client", "secret", refresh_margin=30)
+        token_manager.session.fetch_token = MagicMock(
+            side_effect=[{"access_token": "token1", "expires_in": 20}, {"access_token": "token2", "expires_in": 20}]
+        )
+        with patch("Utils.oauth.time.monotonic", return_value=1000):
+            self.assertEqual(token_manager.get_token(), "token1")
+            self.assertEqual(token_manager.get_token(), "token1")
+        with patch("Utils.oauth.time.monotonic", return_value=1009):
+            self.assertEqual(token_manager.get_token(), "token1")
+        with patch("Utils.oauth.time.monotonic", return_value=1010):
+            self.assertEqual(token_manager.get_token(), "token2")
+        self.assertEqual(token_manager.session.fetch_token.call_count, 2)
+
+    # Test that an invalidated access token is renewed
+    def test_invalidate(self):
+        token_manager = TokenManager("https://example.com/auth/realms/example", "client", "secret")
+        token_manager.session.fetch_token = MagicMock(
+            side_effect=[{"access_token": "token1", "expires_in": 300}, {"access_token": "token2", "expires_in": 300}]
+        )
+        self.assertEqual(token_manager.get_token(), "token1")
+        token_manager.invalidate()
+        self.assertEqual(token_manager.get_token(), "token2")
+        token_manager.invalidate("token1")
+        self.assertEqual(token_manager.get_token(), "token2")
+        self.assertEqual(token_manager.session.fetch_token.call_count, 2)
+
+    # Test that the token manager is shared within the process
+    def test_get_token_manager_shared(self):
+        token_manager = get_token_manager("https://example.com/shared", "client", "secret")
+        self.assertIs(get_token_manager("https://example.com/shared", "client", "secret"), token_manager)
+
+
+class TestConcurrency(unittest.TestCase):
+    # Test that messages sharing an id or a client_id end up in the same group
+    def test_group_by_keys(self):
+        messages = [
+            {"id": 1, "client_id": "a"},
+            {"id": 2, "client_id": "b"},
+            {"id": 3, "client_id": "a"},
+            {"id": 2, "client_id": "c"},
+            {"id": 4, "client_id": "c"},
+            {"id": 5},
+        ]
+        self.assertEqual(group_by_keys(messages, get_deployment_keys), [[0, 2], [1, 3, 4], [5]])
+
+    # Test that results keep the order of the messages and that messages of a service run in order
+    def test_run_in_order(self):
+        messages = [{"id": i % 3, "seq": i} for i in range(12)]
+        lock = threading.Lock()
+        seen = {}
+
+        def worker(msg):
+            with lock:
+                seen.setdefault(msg["id"], []).append(msg["seq"])
+            time.sleep(0.01)
+            return msg["seq"]
+
+        results = run_in_order(messages, get_deployment_keys, worker, 3)
+        self.assertEqual(results, list(range(12)))
+        for service_id, sequence in seen.items():
+            self.assertEqual(sequence, sorted(sequence))
+
+
+class TestCoalesce(unittest.TestCase):
+    # Test that the messages of every service are folded into their net operations
+    def test_coalesce_messages(self):
+        messages = [
+            {"id": 1, "client_id": "a", "deployment_type": "create", "service_name": "first"},
+            {"id": 2, "client_id": "b", "deployment_type": "edit", "service_name": "first"},
+            {"id": 1, "client_id": "a", "deployment_type": "edit", "service_name": "second"},
+            {"id": 3, "client_id": "c", "deployment_type": "create"},
+            {"id": 2, "client_id": "b", "deployment_type": "edit", "service_name": "second"},
+            {"id": 3, "client_id": "c", "deployment_type": "delete"},
+            {"id": 4, "client_id": "d", "deployment_type": "edit"},
+            {"id": 4, "client_id": "d", "deployment_type": "delete"},
+            {"id": 5, "client_id": "e", "deployment_type": "delete"},
+            {"id": 5, "client_id": "e", "deployment_type": "create"},
+        ]
+        operations, owners = coalesce_messages(messages)
+        self.assertEqual(
+            operations,
+            [
+                {"id": 1, "client_id": "a", "deployment_type": "create", "service_name": "second"},
+                {"id": 2, "client_id": "b", "deployment_type": "edit", "service_name": "second"},
+                {"id": 4, "client_id": "d", "deployment_type": "delete"},
+                {"id": 5, "client_id": "e", "deployment_type": "delete"},
+                {"id": 5, "client_id": "e", "deployment_type": "create"},
+            ],
+        )
+        self.assertEqual(owners, [0, 1, 0, None, 1, None, 2, 2, 3, 4])
+
+    # Test that the messages of services sharing a client_id are not folded
+    def test_coalesce_messages_shared_client_id(self):
+        messages = [
+            {"id": 1, "client_id": "a", "deployment_type": "edit"},
+            {"id": 2, "client_id": "a", "deployment_type": "create"},
+            {"id": 1, "client_id": "a", "deployment_type": "edit"},
+        ]
+        operations, owners = coalesce_messages(messages)
+        self.assertEqual(operations, messages)
+        self.assertEqual(owners, [0, 1, 2])
+
+    # Test that every original message gets a message to be published
+    def test_expand_pub_messages(self):
+        messages = [
+            {"id": 1, "deployment_type": "create"},
+            {"id": 1, "deployment_type": "edit"},
+            {"id": 3, "deployment_type": "create"},
+            {"id": 3, "deployment_type": "delete"},
+        ]
+        operations, owners = coalesce_messages(messages)
+        pub_messages = [{"attributes": {}, "data": {"id": 1, "status_code": 201, "state": "deployed"}}]
+        expanded = expand_pub_messages(messages, owners, pub_messages, "")
+        self.assertEqual([msg["data"]["id"] for msg in expanded], [1, 1, 3, 3])
+        self.assertEqual(expanded[0], expanded[1])
+        self.assertIsNot(expanded[0], expanded[1])
+        self.assertEqual(expanded[2]["data"], {"id": 3, "status_code": 204, "state": "deployed"})
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    # Test that the limit grows additively and shrinks multiplicatively
+    def test_aimd(self):
+        limiter = AdaptiveLimiter(initial_limit=4, max_limit=8, latency_target=1)
+        for _ in range(8):
+            limiter.acquire()
+            limiter.release(0.1)
+        self.assertEqual(limiter.get_stats()["limit"], 5)
+        limiter.acquire()
+        limiter.release(0.1, overloaded=True)
+        self.assertEqual(limiter.get_stats(), {"limit": 2, "in_flight": 0, "queue_depth": 0})
+
+    # Test that requests over the limit wait for a request to complete
+    def test_queue_depth(self):
+        limiter = AdaptiveLimiter(initial_limit=1)
+        limiter.acquire()
+        waiter = threading.Thread(target=limiter.acquire)
+        waiter.start()
+        time.sleep(0.05)
+        self.assertEqual(limiter.get_stats(), {"limit": 1, "in_flight": 1, "queue_depth": 1})
+        limiter.release(0.1)
+        waiter.join(1)
+        self.assertEqual(limiter.get_stats()["in_flight"], 1)
+
+    # Test that a Retry-After pauses new requests
+    def test_retry_after(self):
+        limiter = AdaptiveLimiter(initial_limit=4)
+        limiter.acquire()
+        limiter.release(0.1, overloaded=True, retry_after=0.2)
+        start = time.monotonic()
+        limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+    # Test that waiting for the limiter is bounded by the timeout
+    def test_acquire_timeout(self):
+        limiter = AdaptiveLimiter(initial_limit=1)
+        limiter.acquire()
+        self.assertFalse(limiter.acquire(0.05))
+        limiter.release(0.1, overloaded=True, retry_after=10)
+        start = time.monotonic()
+        self.assertFalse(limiter.acquire(5))
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(limiter.get_stats(), {"limit": 1, "in_flight": 0, "queue_depth": 0})
+
+    # Test parsing Retry-After headers
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("3"), 3)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+
+
+class TestResilience(unittest.TestCase):
+    # Test that only idempotent requests are retried
+    def test_retry_policy(self):
+        retry_policy = RetryPolicy(max_retries=2, backoff=1, max_backoff=3)
+        self.assertTrue(retry_policy.should_retry("put", 1))
+        self.assertFalse(retry_policy.should_retry("PUT", 2))
+        self.assertFalse(retry_policy.should_retry("POST", 0))
+        self.assertLessEqual(retry_policy.get_delay(5), 3)
+        self.assertEqual(retry_policy.get_delay(0, retry_after=10), 3)
+
+    # Test that the circuit opens, fails fast and closes after a successful probe
+    def test_circuit_breaker(self):
+        circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+        for _ in range(2):
+            circuit_breaker.before_request()
+            circuit_breaker.record(False)
+        self.assertEqual(circuit_breaker.get_state(), CircuitBreaker.OPEN)
+        self.assertGreater(circuit_breaker.get_open_delay(), 0)
+        self.assertRaises(CircuitOpenError, circuit_breaker.before_request)
+        time.sleep(0.15)
+        circuit_breaker.before_request()
+        self.assertEqual(circuit_breaker.get_state(), CircuitBreaker.HALF_OPEN)
+        self.assertRaises(CircuitOpenError, circuit_breaker.before_request)
+        circuit_breaker.record(True)
+        self.assertEqual(circuit_breaker.get_state(), CircuitBreaker.CLOSED)
+
+    # Test that the session retries transient failures of idempotent requests
+    def test_backend_session_retry(self):
+        unavailable = MagicMock(status_code=503, headers={})
+        ok = MagicMock(status_code=200, headers={})
+        session = BackendSession(retry_policy=RetryPolicy(backoff=0.01), circuit_breaker=CircuitBreaker())
+        with patch.object(
+            requests.Session, "request", side_effect=[requests.exceptions.ConnectionError(), unavailable, ok]
+        ) as request:
+            self.assertIs(session.request("GET", "https://example.com"), ok)
+            self.assertEqual(request.call_count, 3)
+        with patch.object(requests.Session, "request", return_value=unavailable) as request:
+            self.assertIs(session.request("POST", "https://example.com"), unavailable)
+            self.assertEqual(request.call_count, 1)
+
+
+class TestDeadline(unittest.TestCase):
+    # Test that request timeouts are bounded by what is left of the deadline
+    def test_get_request_timeout(self):
+        self.assertEqual(get_request_timeout(5, 60), (5, 60))
+        with deadline_scope(10):
+            connect_timeout, read_timeout = get_request_timeout(5, 60)
+            self.assertEqual(connect_timeout, 5)
+            self.assertLessEqual(read_timeout, 10)
+        with deadline_scope(0.01):
+            time.sleep(0.02)
+            self.assertRaises(DeadlineExceeded, get_request_timeout)
+        self.assertEqual(get_request_timeout(5, 60), (5, 60))
+
+    # Test that worker threads inherit the deadline of the caller
+    def test_deadline_in_worker_threads(self):
+        with deadline_scope(10):
+            read_timeouts = map_concurrently(lambda item: get_request_timeout(5, 60)[1], [1, 2, 3], 3)
+        self.assertTrue(all(read_timeout <= 10 for read_timeout in read_timeouts))
+
+    # Test that a request waiting for the limiter fails once the deadline passes and is never sent
+    def test_limiter_wait_within_deadline(self):
+        limiter = AdaptiveLimiter(initial_limit=1)
+        limiter.acquire()
+        transport = HttpTransport(BackendSession(limiter=limiter), 5, 60)
+        with patch.object(requests.Session, "request") as request:
+            with deadline_scope(0.05):
+                self.assertRaises(DeadlineExceeded, transport.request, "GET", "https://example.com")
+            request.assert_not_called()
+        self.assertEqual(limiter.get_stats()["in_flight"], 1)
+
+    # Test that requests that run out of time waiting for the limiter do not open the circuit
+    def test_limiter_deadline_keeps_circuit_closed(self):
+        limiter = AdaptiveLimiter(1, 1, 1)
+        limiter.acquire()
+        circuit_breaker = CircuitBreaker(3, 30)
+        transport = HttpTransport(BackendSession(limiter=limiter, circuit_breaker=circuit_breaker), 5, 60)
+        with patch.object(requests.Session, "request") as request:
+            for _ in range(3):
+                with deadline_scope(0.01):
+                    self.assertRaises(DeadlineExceeded, transport.request, "GET", "https://example.com")
+            request.assert_not_called()
+        self.assertEqual(circuit_breaker.get_state(), CircuitBreaker.CLOSED)
+        self.assertEqual(circuit_breaker.failures, 0)
+
+        session = AsyncBackendSession(limiter=limiter, circuit_breaker=circuit_breaker)
+        for _ in range(3):
+            with deadline_scope(0.01):
+                self.assertRaises(DeadlineExceeded, asyncio.run, session.request("GET", "https://example.com"))
+        self.assertEqual(circuit_breaker.get_state(), CircuitBreaker.CLOSED)
+
+    # Test that a half-open probe that never reaches the backend gives its slot back
+    def test_circuit_breaker_cancel(self):
+        circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        circuit_breaker.before_request()
+        circuit_breaker.record(False)
+        circuit_breaker.before_request()
+        self.assertEqual(circuit_breaker.get_state(), CircuitBreaker.HALF_OPEN)
+        circuit_breaker.cancel()
+        circuit_breaker.before_request()
+        self.assertEqual(circuit_breaker.get_state(), CircuitBreaker.HALF_OPEN)
+
+    # Test that the request timeout is computed after the wait for the limiter
+    def test_limiter_wait_shortens_timeout(self):
+        limiter = AdaptiveLimiter(initial_limit=1)
+        limiter.acquire()
+        threading.Timer(0.2, limiter.release, (0.1,)).start()
+        transport = HttpTransport(BackendSession(limiter=limiter), 5, 60)
+        ok = MagicMock(status_code=200, text="", headers={})
+        with patch.object(requests.Session, "request", return_value=ok) as request:
+            with deadline_scope(1):
+                transport.request("GET", "https://example.com")
+            self.assertLessEqual(request.call_args.kwargs["timeout"][1], 0.85)
+
+
+class TestHttpTransport(unittest.TestCase):
+    # Test that responses are normalized and every request is reported to the hooks
+    def test_request(self):
+        hook = MagicMock()
+        transport = HttpTransport(MagicMock(), hooks=[hook])
+        transport.session.request = MagicMock(
+            side_effect=[
+                MagicMock(status_code=200, text='{"id": 1}', headers={}, json=MagicMock(return_value={"id": 1})),
+                MagicMock(status_code=201, text="", headers={"Location": "https://example.com/1"}),
+                MagicMock(status_code=200, text="deleted", headers={}),
+            ]
+        )
+        self.assertEqual(transport.request("GET", "https://example.com/1"), {"status": 200, "response": {"id": 1}})
+        self.assertEqual(
+            transport.request("POST", "https://example.com", json={"id": 1}),
+            {"status": 201, "response": "OK", "location": "https://example.com/1"},
+        )
+        self.assertEqual(transport.request("DELETE", "https://example.com/1"), {"status": 200, "response": "OK"})
+        self.assertEqual(hook.call_count, 3)
+        self.assertEqual(hook.call_args[0][:3], ("DELETE", "https://example.com/1", 200))
+
+    # Test that a request rejected with 401 is sent once more with a renewed token
+    def test_request_renews_rejected_token(self):
+        token_manager = MagicMock()
+        token_manager.get_token = MagicMock(side_effect=["token1", "token2"])
+        transport = HttpTransport(MagicMock(), token_manager=token_manager)
+        unauthorized = MagicMock(status_code=401, text="")
+        unauthorized.raise_for_status = MagicMock(side_effect=requests.exceptions.HTTPError("401"))
+        ok = MagicMock(status_code=200, text="", headers={})
+        transport.session.request = MagicMock(side_effect=[unauthorized, ok])
+        self.assertEqual(
+            transport.request("POST", "https://example.com", headers={"Content-Type": "application/json"}),
+            {"status": 200, "response": "OK"},
+        )
+        token_manager.invalidate.assert_called_once_with("token1")
+        self.assertEqual(
+            transport.session.request.call_args.kwargs["headers"],
+            {"Content-Type": "application/json", "Authorization": "Bearer token2"},
+        )
+
+    # Test that failed requests are normalized into errors
+    def test_request_error(self):
+        transport = HttpTransport(MagicMock())
+        response = MagicMock(status_code=404, text='{"error": "not found"}')
+        response.raise_for_status = MagicMock(side_effect=requests.exceptions.HTTPError("404"))
+        response.json = MagicMock(return_value={"error": "not found"})
+        transport.session.request = MagicMock(side_effect=[response, requests.exceptions.ConnectionError("refused")])
+        result = transport.request("GET", "https://example.com/1")
+        self.assertEqual(result["status"], 404)
+        self.assertEqual(result["response"], {"error": "not found"})
+        result = transport.request("GET", "https://example.com/1")
+        self.assertEqual(result["status"], 0)
+        self.assertIn("refused", result["error"])
+
+    # Test that the session created from a config section pools connections per host as configured
+    def test_create_session_from_config(self):
+        session = create_session_from_config({"pool_connections": 4, "pool_maxsize": 20, "pool_block": True})
+        self.assertIsInstance(session, BackendSession)
+        for prefix in ("https://", "http://"):
+            adapter = session.get_adapter(prefix + "example.com")
+            self.assertEqual(adapter.poolmanager.connection_pool_kw["maxsize"], 20)
+            self.assertTrue(adapter.poolmanager.connection_pool_kw["block"])
+            self.assertEqual(adapter.poolmanager.pools._maxsize, 4)
+        self.assertIs(session.get_adapter("https://example.com"), session.get_adapter("http://example.com"))
+
+        session = create_session_from_config({"adaptive_limit": False, "retries": 0, "circuit_failure_threshold": 0})
+        self.assertNotIsInstance(session, BackendSession)
+        adapter = session.get_adapter("https://example.com")
+        self.assertEqual(adapter.poolmanager.connection_pool_kw["maxsize"], 10)
+        self.assertFalse(adapter.poolmanager.connection_pool_kw["block"])
+        self.assertEqual(adapter.poolmanager.pools._maxsize, 10)
+
+
+class TestAsyncHttpTransport(unittest.TestCase):
+    # Test that responses and errors are normalized like HttpTransport
+    def test_request(self):
+        transport = AsyncHttpTransport(MagicMock())
+        transport.session.request = AsyncMock(
+            side_effect=[
+                AsyncResponse(201, "", {"Location": "https://example.com/1"}),
+                AsyncResponse(200, "deleted", {}),
+                AsyncResponse(404, '{"error": "not found"}', {}),
+                aiohttp.ClientConnectionError("refused"),
+            ]
+        )
+
+        async def send_requests():
+            return [
+                await transport.request("POST", "https://example.com", json={"id": 1}),
+                await transport.request("DELETE", "https://example.com/1"),
+                await transport.request("GET", "https://example.com/1"),
+                await transport.request("GET", "https://example.com/1"),
+            ]
+
+        created, deleted, not_found, refused = asyncio.run(send_requests())
+        self.assertEqual(created, {"status": 201, "response": "OK", "location": "https://example.com/1"})
+        self.assertEqual(deleted, {"status": 200, "response": "OK"})
+        self.assertEqual(not_found["status"], 404)
+        self.assertEqual(not_found["response"], {"error": "not found"})
+        self.assertEqual(refused["status"], 0)
+        self.assertIn("refused", refused["error"])
+
+    # Test that an asyncio request rejected with 401 is sent once more with a renewed token
+    def test_request_renews_rejected_token(self):
+        token_manager = MagicMock()
+        token_manager.get_token = MagicMock(side_effect=["token1", "token2"])
+        transport = AsyncHttpTransport(MagicMock(), token_manager=token_manager)
+        transport.session.request = AsyncMock(side_effect=[AsyncResponse(401, "", {}), AsyncResponse(204, "", {})])
+        self.assertEqual(
+            asyncio.run(transport.request("PUT", "https://example.com")), {"status": 204, "response": "OK"}
+        )
+        token_manager.invalidate.assert_called_once_with("token1")
+        self.assertEqual(transport.session.request.call_args.kwargs["headers"], {"Authorization": "Bearer token2"})
+
+    # Test that the asyncio session retries transient failures and opens the circuit like BackendSession
+    def test_async_backend_session_retry(self):
+        circuit_breaker = CircuitBreaker(failure_threshold=3)
+        session = AsyncBackendSession(retry_policy=RetryPolicy(backoff=0.01), circuit_breaker=circuit_breaker)
+        session.send_limited = AsyncMock(
+            side_effect=[
+                aiohttp.ClientConnectionError("refused"),
+                AsyncResponse(503, "", {}),
+                AsyncResponse(200, "", {}),
+            ]
+        )
+        self.assertEqual(asyncio.run(session.request("GET", "https://example.com")).status, 200)
+        self.assertEqual(session.send_limited.call_count, 3)
+        session.send_limited = AsyncMock(return_value=AsyncResponse(503, "", {}))
+        transport = AsyncHttpTransport(session)
+        for _ in range(3):
+            self.assertEqual(asyncio.run(transport.request("POST", "https://example.com"))["status"], 503)
+        self.assertEqual(asyncio.run(transport.request("POST", "https://example.com"))["status"], 0)
+        self.assertEqual(session.send_limited.call_count, 3)
+        self.assertGreater(get_open_circuit_delay(session), 0)
+
+    # Test that the asyncio session waits for the shared limiter within the deadline
+    def test_async_backend_session_limiter(self):
+        limiter = AdaptiveLimiter(initial_limit=1)
+        limiter.acquire()
+        session = AsyncBackendSession(limiter=limiter)
+        session.session = MagicMock()
+        with deadline_scope(0.05):
+            self.assertRaises(DeadlineExceeded, asyncio.run, session.request("GET", "https://example.com"))
+        session.session.request.assert_not_called()
+        self.assertEqual(limiter.get_stats(), {"limit": 1, "in_flight": 1, "queue_depth": 0})
+
+
+class TestFiles(unittest.TestCase):
+    # Test that files are replaced with their mode and left alone when their content is unchanged
+    def test_write_file_atomically(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metadata.php")
+            self.assertTrue(write_file_atomically(path, lambda: iter(["<?php", "\n"])))
+            os.chmod(path, 0o640)
+            inode = os.stat(path).st_ino
+            self.assertFalse(write_file_atomically(path, lambda: iter(["<?", "php\n"])))
+            self.assertEqual(os.stat(path).st_ino, inode)
+            self.assertTrue(write_file_atomically(path, lambda: iter(["<?php", "\nreturn [];\n"])))
+            self.assertNotEqual(os.stat(path).st_ino, inode)
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o640)
+            with open(path) as f:
+                self.assertEqual(f.read(), "<?php\nreturn [];\n")
+            self.assertEqual(os.listdir(directory), ["metadata.php"])
+            self.assertIsNone(get_file_digest(os.path.join(directory, "missing.php")))
+
+    # Test that new files get the default mode without changing the umask of the process
+    def test_write_file_atomically_new_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metadata.php")
+            with patch("os.umask") as umask:
+                self.assertTrue(write_file_atomically(path, lambda: iter(["<?php\n"])))
+            umask.assert_not_called()
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o666 & ~UMASK)
+
+    # Test that a failed write leaves no temporary file behind
+    def test_write_file_atomically_failure(self):
+        renders = []
+
+        def render():
+            renders.append(1)
+            yield "<?php"
+            if len(renders) > 1:
+                raise ValueError("render failed")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metadata.php")
+            with self.assertRaises(ValueError):
+                write_file_atomically(path, render)
+            self.assertEqual(os.listdir(directory), [])
+
+
+class TestFingerprintStore(unittest.TestCase):
+    # Test that only unchanged edits of successfully deployed services match
+    def test_check_and_record(self):
+        digest = get_fingerprint({"clientId": "testId1", "redirectUris": ["https://example.com"]})
+        self.assertEqual(digest, get_fingerprint({"redirectUris": ["https://example.com"], "clientId": "testId1"}))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "fingerprints.db")
+            store = FingerprintStore(path, "https://example.com/realms/a")
+            store.record("12", "create", digest, {"status": 500, "error": "failed"}, "34", "testId1")
+            self.assertIsNone(store.check("12", "edit", digest))
+            store.record("12", "create", digest, {"status": 201, "response": "OK"}, "34", "testId1")
+            self.assertIsNone(store.check("12", "create", digest))
+            store.record("12", "create", digest, {"status": 201, "response": "OK"}, "34", "testId1")
+            store.close()
+
+            store = FingerprintStore(path, "https://example.com/realms/a")
+            self.assertEqual(store.check("12", "edit", digest), {"external_id": "34", "client_id": "testId1"})
+            other_store = FingerprintStore(path, "https://example.com/realms/b")
+            self.assertIsNone(other_store.match("12", digest))
+            other_store.close()
+            self.assertIsNone(store.check("12", "edit", get_fingerprint({"clientId": "testId2"})))
+            self.assertIsNone(store.match("12", digest))
+            store.close()
+
+
+class TestSyncScheduler(unittest.TestCase):
+    # Test that a burst of requests is covered by one sync and one follow-up sync
+    def test_sync_coalescing(self):
+        started = threading.Event()
+        release = threading.Event()
+        done = []
+
+        def sync():
+            started.set()
+            release.wait(5)
+            return {"status": 200, "response": "OK"}
+
+        sync_scheduler = SyncScheduler(sync, lambda response, items: done.append(items), debounce=0.05)
+        sync_scheduler.request([1])
+        sync_scheduler.request([2])
+        self.assertTrue(started.wait(5))
+        for item in range(3, 200):
+            sync_scheduler.request([item])
+        release.set()
+        sync_scheduler.close(5)
+        self.assertEqual(done, [[1, 2], list(range(3, 200))])
+
+    # Test that closing runs a final sync for the pending requests without waiting for the debounce
+    def test_sync_close(self):
+        done = []
+        sync_scheduler = SyncScheduler(
+            MagicMock(side_effect=RuntimeError("sync failed")),
+            lambda response, items: done.append((response["status"], items)),
+            debounce=60,
+        )
+        sync_scheduler.request(["message"])
+        sync_scheduler.close(5)
+        self.assertEqual(done, [(0, ["message"])])
+        self.assertFalse(sync_scheduler.thread.is_alive())